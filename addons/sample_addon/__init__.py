@@ -1,11 +1,10 @@
 import bpy
 
 from .config import __addon_name__
-from .i18n.dictionary import dictionary
 from ...common.class_loader import auto_load
 from ...common.class_loader.auto_load import add_properties, remove_properties
-from ...common.i18n.dictionary import common_dictionary
-from ...common.i18n.i18n import load_dictionary
+from ...common.class_loader.startup_profile import startup_profile
+from ...common.i18n.i18n import load_dictionary, has_compiled_catalogs, register_translations, unregister_translations
 
 # Add-on info
 bl_info = {
@@ -34,21 +33,27 @@ _addon_properties = {}
 # }
 
 def register():
-    # Register classes
-    auto_load.init()
-    auto_load.register()
-    add_properties(_addon_properties)
-
-    # Internationalization
-    load_dictionary(dictionary)
-    bpy.app.translations.register(__addon_name__, common_dictionary)
+    # Measures the steps below when profiling is enabled, e.g. by test.py --profile
+    # 启用性能分析时(如test.py --profile)统计以下各步骤的耗时
+    with startup_profile(__addon_name__):
+        # Register classes
+        auto_load.init()
+        auto_load.register()
+        add_properties(_addon_properties)
+
+        # Internationalization, the released addon loads the translations compiled from the dictionary instead
+        # 发布后的插件直接加载编译好的翻译 无需导入字典
+        if not has_compiled_catalogs():
+            from .i18n.dictionary import dictionary
+            load_dictionary(dictionary)
+        register_translations(__addon_name__)
 
     print("{} addon is installed.".format(__addon_name__))
 
 
 def unregister():
     # Internationalization
-    bpy.app.translations.unregister(__addon_name__)
+    unregister_translations(__addon_name__)
     # unRegister classes
     auto_load.unregister()
     remove_properties(_addon_properties)
@@ -0,0 +1,368 @@
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from common.class_loader.toposort import toposort, get_reg_order
+
+
+# Benchmarks of the framework that run without Blender
+# 无需Blender即可运行的框架性能测试
+
+
+def make_synthetic_classes(count: int, seed=0) -> dict:
+    # {class: classes it depends on}, each class depends on up to 3 of the 20 classes defined before it like a deep
+    # hierarchy of panels and property groups, about one class in five has a reg_order
+    rng = random.Random(seed)
+    classes = []
+    for i in range(count):
+        namespace = {"_reg_order": rng.randrange(10)} if rng.random() < 0.2 else {}
+        classes.append(type(f"SyntheticClass{i}", (), namespace))
+    deps_dict = {}
+    for i, cls in enumerate(classes):
+        deps_dict[cls] = {classes[rng.randrange(max(0, i - 20), i)] for _ in range(rng.randrange(4))} if i else set()
+    items = list(deps_dict.items())
+    rng.shuffle(items)
+    return dict(items)
+
+
+def round_based_toposort(deps_dict: dict) -> list:
+    # the algorithm used before common/class_loader/toposort.py, rebuilding deps_dict on every round
+    sorted_list = []
+    sorted_values = set()
+    while len(deps_dict) > 0:
+        unsorted = []
+        independent = []
+        for value, deps in deps_dict.items():
+            if len(deps) == 0:
+                independent.append(value)
+            else:
+                unsorted.append(value)
+        independent.sort(key=get_reg_order)
+        for value in independent:
+            sorted_list.append(value)
+            sorted_values.add(value)
+        deps_dict = {value: deps_dict[value] - sorted_values for value in unsorted}
+    return sorted_list
+
+
+def benchmark_toposort(sizes: list, repeat: int, compare: bool):
+    print(f"{'classes':>8} {'toposort (ms)':>14}" + (f" {'round based (ms)':>17}" if compare else ""))
+    for size in sizes:
+        deps_dict = make_synthetic_classes(size)
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            result = toposort(deps_dict)
+            timings.append(time.perf_counter() - start_time)
+        line = f"{size:>8} {min(timings) * 1000:>14.2f}"
+        if compare:
+            start_time = time.perf_counter()
+            expected = round_based_toposort(deps_dict)
+            line += f" {(time.perf_counter() - start_time) * 1000:>17.2f}"
+            if result != expected:
+                raise AssertionError(f"toposort and round based toposort differ for {size} classes")
+        print(line)
+
+
+# Release pipeline benchmark 发布流程性能测试
+# A synthetic workspace is generated for every size: a copy of the framework of this project with generated addons and
+# a config.ini pointing the release, test and Blender addon folders outside of it. The phases are measured by a worker
+# process running the copied framework in the synthetic workspace, so neither Blender nor this workspace is touched.
+RELEASE_PHASES = ("dependencies_cold", "dependencies_warm", "rewrite_imports", "registration_manifest",
+                  "release_folder", "release_zip", "release_all", "test_sync_full", "test_sync_incremental")
+_BASELINE_VERSION = 2
+_FRAMEWORK_FILES = ("framework.py", "main.py", "benchmark.py", os.path.join("addons", "__init__.py"))
+_FRAMEWORK_FOLDERS = ("common",)
+
+
+def generate_workspace(folder, addons=2, modules=50, fan_out=3, depth=2, assets=4, asset_kb=64, seed=0) -> list:
+    """
+    Generate a synthetic workspace in folder, with the framework of this project and generated addons.
+    Every addon has `modules` modules spread over `depth` levels of packages, each module imports `fan_out` modules
+    generated before it (from the same addon, alternating both import styles) and one of the shared modules in
+    common/synthetic. Every addon also has `assets` binary files of `asset_kb` KB.
+    The release, test and Blender addon folders are created next to folder.
+
+    Returns:
+        list: names of the generated addons
+    """
+    rng = random.Random(seed)
+    project_root = os.path.dirname(os.path.abspath(__file__))
+    os.makedirs(folder)
+    for file in _FRAMEWORK_FILES:
+        os.makedirs(os.path.dirname(os.path.join(folder, file)), exist_ok=True)
+        shutil.copy2(os.path.join(project_root, file), os.path.join(folder, file))
+    for framework_folder in _FRAMEWORK_FOLDERS:
+        shutil.copytree(os.path.join(project_root, framework_folder), os.path.join(folder, framework_folder),
+                        ignore=shutil.ignore_patterns("__pycache__", "*.pyc", "synthetic"))
+
+    parent_folder = os.path.dirname(os.path.abspath(folder))
+    for name in ("release", "test", "blender_addons"):
+        os.makedirs(os.path.join(parent_folder, name), exist_ok=True)
+    with open(os.path.join(folder, "config.ini"), "w", encoding="utf-8") as f:
+        f.write("[blender]\n"
+                f"addon_path = {os.path.join(parent_folder, 'blender_addons')}\n"
+                "[default]\n"
+                f"release_dir = {os.path.join(parent_folder, 'release')}\n"
+                f"test_release_dir = {os.path.join(parent_folder, 'test')}\n"
+                "is_extension = false\n")
+
+    shared_modules = max(1, modules // 10)
+    shared_folder = os.path.join(folder, "common", "synthetic")
+    os.makedirs(shared_folder)
+    _write_module(os.path.join(shared_folder, "__init__.py"), [])
+    for i in range(shared_modules):
+        _write_module(os.path.join(shared_folder, f"shared_{i}.py"), [], f"Shared{i}")
+
+    addon_names = [f"synthetic_addon_{i}" for i in range(addons)]
+    for addon_name in addon_names:
+        addon_folder = os.path.join(folder, "addons", addon_name)
+        packages = [addon_folder]
+        for level in range(depth):
+            packages.append(os.path.join(packages[-1], f"layer{level}"))
+        for package in packages[1:]:
+            os.makedirs(package)
+            _write_module(os.path.join(package, "__init__.py"), [])
+        with open(os.path.join(addon_folder, "__init__.py"), "w", encoding="utf-8") as f:
+            f.write(f'bl_info = {{"name": "{addon_name}", "blender": (3, 5, 0), "version": (0, 0, 1)}}\n\n\n'
+                    "def register():\n    pass\n\n\ndef unregister():\n    pass\n")
+        module_names = []
+        for i in range(modules):
+            level = i % len(packages)
+            module_name = ".".join(["addons", addon_name] + [f"layer{j}" for j in range(level)] + [f"module_{i}"])
+            shared_module = rng.randrange(shared_modules)
+            imports = [f"from common.synthetic.shared_{shared_module} import Shared{shared_module}"]
+            for j in rng.sample(range(len(module_names)), min(fan_out, len(module_names))):
+                imported_module = module_names[j]
+                if j % 2 == 0:
+                    imports.append(f"from {imported_module} import function_{j}")
+                else:
+                    imports.append(f"import {imported_module}")
+            _write_module(os.path.join(packages[level], f"module_{i}.py"), imports, f"Module{i}", f"function_{i}")
+            module_names.append(module_name)
+        asset_folder = os.path.join(addon_folder, "assets")
+        os.makedirs(asset_folder)
+        for i in range(assets):
+            with open(os.path.join(asset_folder, f"asset_{i}.bin"), "wb") as f:
+                f.write(rng.randbytes(asset_kb * 1024))
+    return addon_names
+
+
+def _write_module(file_path, imports: list, class_name=None, function_name=None):
+    lines = ["import bpy"] + imports + [""]
+    if class_name is not None:
+        lines += ["", f"class {class_name}(bpy.types.Operator):",
+                  f'    bl_idname = "synthetic.{class_name.lower()}"',
+                  f'    bl_label = "{class_name}"', "",
+                  "    def execute(self, context):",
+                  "        total = 0",
+                  "        for i in range(10):",
+                  "            total += i * i",
+                  "        return {'FINISHED'}", ""]
+    if function_name is not None:
+        lines += ["", f"def {function_name}(values):",
+                  "    # synthetic helper",
+                  "    return [value * 2 for value in values if value % 3]", ""]
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def measure_release_phases(addon_names: list, repeat: int) -> dict:
+    # runs in the synthetic workspace, returns {phase: [milliseconds of every run]}
+    import contextlib
+    import io
+    import framework
+    from common.class_loader.import_rewriter import ImportRewriter
+    from common.class_loader.registration_manifest import build_registration_manifest
+
+    timings = {phase: [] for phase in RELEASE_PHASES}
+    init_files = {name: framework.get_init_file_path(name) for name in addon_names}
+    py_files = [os.path.join(folder, file) for name in addon_names
+                for folder, _, files in os.walk(os.path.join(framework._ADDON_ROOT, name))
+                for file in files if file.endswith(".py")]
+    release_files = {name: framework.collect_release_files(init_files[name], name) for name in addon_names}
+    touched_file = next(file for file in release_files[addon_names[0]].values() if file.endswith("module_0.py"))
+    cache_folder = os.path.join(framework.PROJECT_ROOT, framework._CACHE_FOLDER)
+
+    def timed(phase, function):
+        start_time = time.perf_counter()
+        function()
+        timings[phase].append((time.perf_counter() - start_time) * 1000)
+
+    def rewrite_imports():
+        for name in addon_names:
+            import_rewriter = ImportRewriter(release_files[name].keys(), name, False)
+            for relative_path, source_file in release_files[name].items():
+                if relative_path.endswith(".py"):
+                    framework.build_release_file(relative_path, source_file, import_rewriter)
+
+    def build_manifests():
+        for name in addon_names:
+            build_registration_manifest({relative_path.replace(os.sep, "/"): framework.read_utf8(source_file)
+                                         for relative_path, source_file in release_files[name].items()
+                                         if relative_path.endswith(".py")})
+
+    def release(need_zip):
+        for name in addon_names:
+            framework.release_addon(init_files[name], name, release_dir=framework.DEFAULT_RELEASE_DIR,
+                                    need_zip=need_zip, is_extension=False)
+
+    def sync_full():
+        shutil.rmtree(framework.TEST_RELEASE_DIR, ignore_errors=True)
+        shutil.rmtree(os.path.join(framework.BLENDER_ADDON_PATH, addon_names[0]), ignore_errors=True)
+        framework.update_addon_for_test(init_files[addon_names[0]], addon_names[0])
+
+    def sync_incremental():
+        with open(touched_file, "a", encoding="utf-8") as f:
+            f.write("# touched\n")
+        framework.update_addon_for_test(init_files[addon_names[0]], addon_names[0], changed_paths={touched_file})
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            shutil.rmtree(cache_folder, ignore_errors=True)
+            timed("dependencies_cold", lambda: framework.find_all_dependencies(py_files, framework.PROJECT_ROOT))
+            timed("dependencies_warm", lambda: framework.find_all_dependencies(py_files, framework.PROJECT_ROOT))
+            timed("rewrite_imports", rewrite_imports)
+            timed("registration_manifest", build_manifests)
+            timed("release_folder", lambda: release(False))
+            timed("release_zip", lambda: release(True))
+            timed("release_all", lambda: framework.release_addons(
+                addon_names, release_dir=framework.DEFAULT_RELEASE_DIR, need_zip=True, is_extension=False))
+            timed("test_sync_full", sync_full)
+            timed("test_sync_incremental", sync_incremental)
+    return timings
+
+
+def benchmark_release(sizes: list, repeat: int, workspace_options: dict, baseline_file=None, save_baseline=None,
+                      threshold=0.2, min_delta_ms=20.0, keep=False) -> bool:
+    """
+    Measure the release phases for workspaces of every size (modules per addon), print the fastest runs, how they scale
+    with the size and compare them with a baseline. The fastest run of each phase is kept, it is far less sensitive to
+    the load of the machine than the median of a few runs. Returns False if a phase regressed beyond the threshold.
+    """
+    results = {}
+    for size in sizes:
+        temp_folder = tempfile.mkdtemp(prefix="addon_benchmark_")
+        workspace = os.path.join(temp_folder, "workspace")
+        try:
+            addon_names = generate_workspace(workspace, modules=size, **workspace_options)
+            process = subprocess.run([sys.executable, os.path.join(workspace, "benchmark.py"), "release-worker",
+                                      "--repeat", str(repeat), "--addons"] + addon_names,
+                                     cwd=workspace, capture_output=True, text=True, encoding="utf-8")
+            if process.returncode != 0:
+                raise RuntimeError(f"Benchmark worker failed for {size} modules:\n{process.stderr}")
+            timings = json.loads(process.stdout.strip().splitlines()[-1])
+            results[str(size)] = {phase: min(values) for phase, values in timings.items()}
+        finally:
+            if keep:
+                print("Synthetic workspace kept:", workspace)
+            else:
+                shutil.rmtree(temp_folder, ignore_errors=True)
+
+    print_release_results(results, workspace_options)
+    if save_baseline is not None:
+        with open(save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"version": _BASELINE_VERSION, "workspace": workspace_options, "results": results}, f, indent=1)
+        print("Baseline saved:", save_baseline)
+    if baseline_file is None:
+        return True
+    return compare_with_baseline(results, workspace_options, baseline_file, threshold, min_delta_ms)
+
+
+def print_release_results(results: dict, workspace_options: dict):
+    sizes = list(results)
+    print("Fastest milliseconds per phase, modules per addon: " + ", ".join(sizes) + " ("
+          + ", ".join(f"{key}={value}" for key, value in workspace_options.items()) + ")")
+    print(f"{'phase':<22}" + "".join(f"{size:>10}" for size in sizes) + (f"{'scaling':>10}" if len(sizes) > 1 else ""))
+    for phase in RELEASE_PHASES:
+        line = f"{phase:<22}" + "".join(f"{results[size][phase]:>10.1f}" for size in sizes)
+        if len(sizes) > 1:
+            # exponent of time ~ size^k between the smallest and the largest workspace, 1 is linear
+            first, last = results[sizes[0]][phase], results[sizes[-1]][phase]
+            if first > 0 and last > 0:
+                line += f"{math.log(last / first) / math.log(int(sizes[-1]) / int(sizes[0])):>10.2f}"
+        print(line)
+
+
+def compare_with_baseline(results: dict, workspace_options: dict, baseline_file, threshold: float,
+                          min_delta_ms: float) -> bool:
+    # slowdowns smaller than min_delta_ms are considered noise whatever the threshold
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("version") != _BASELINE_VERSION or baseline.get("workspace") != workspace_options:
+        raise ValueError(f"The baseline {baseline_file} was recorded with a different workspace: "
+                         f"{baseline.get('workspace')}")
+    regressions = []
+    for size, fastest_runs in results.items():
+        for phase, fastest in fastest_runs.items():
+            expected = baseline["results"].get(size, {}).get(phase)
+            if expected is None:
+                continue
+            if fastest > expected * (1 + threshold) and fastest - expected > min_delta_ms:
+                regressions.append(f"{phase} with {size} modules: {fastest:.1f} ms, baseline {expected:.1f} ms "
+                                   f"(+{(fastest / expected - 1) * 100:.0f}%)")
+    if regressions:
+        print(f"Regressions beyond {threshold * 100:.0f}%:")
+        for regression in regressions:
+            print("  " + regression)
+        return False
+    print(f"No phase regressed beyond {threshold * 100:.0f}% of the baseline")
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    toposort_parser = subparsers.add_parser("toposort", help='Sort synthetic classes by their registration '
+                                                             'dependencies.')
+    toposort_parser.add_argument('--sizes', default=[1000, 2000, 4000, 8000], type=int, nargs='+',
+                                 help='Numbers of classes to sort.')
+    toposort_parser.add_argument('--repeat', default=5, type=int, help='Number of runs per size, the fastest is '
+                                                                       'reported.')
+    toposort_parser.add_argument('--no_compare', default=False, action='store_true', help='Do not run and check '
+                                                                                          'against the previous round '
+                                                                                          'based algorithm.')
+    release_parser = subparsers.add_parser("release", help='Time the release and test phases on generated '
+                                                           'workspaces, Blender is not needed.')
+    release_parser.add_argument('--sizes', default=[25, 50, 100, 200], type=int, nargs='+',
+                                help='Numbers of modules per addon, one workspace is generated for each of them.')
+    release_parser.add_argument('--addons', default=2, type=int, help='Number of addons in the workspace.')
+    release_parser.add_argument('--fan_out', default=3, type=int, help='Number of addon modules each module imports.')
+    release_parser.add_argument('--depth', default=2, type=int, help='Levels of packages in each addon.')
+    release_parser.add_argument('--assets', default=4, type=int, help='Number of asset files in each addon.')
+    release_parser.add_argument('--asset_kb', default=64, type=int, help='Size of each asset file in KB.')
+    release_parser.add_argument('--seed', default=0, type=int, help='Seed of the workspace generator.')
+    release_parser.add_argument('--repeat', default=5, type=int, help='Number of runs per phase, the fastest is '
+                                                                      'reported.')
+    release_parser.add_argument('--baseline', default=None, help='Json file of a previous run to compare with, '
+                                                                 'exits with 1 if a phase regressed.')
+    release_parser.add_argument('--save_baseline', default=None, help='Save the results into this json file.')
+    release_parser.add_argument('--threshold', default=0.2, type=float, help='Relative slowdown of the fastest run of '
+                                                                             'a phase considered a regression.')
+    release_parser.add_argument('--min_delta_ms', default=20.0, type=float, help='Slowdowns smaller than this are '
+                                                                                'not regressions, timings of small '
+                                                                                'workspaces are noisy.')
+    release_parser.add_argument('--keep', default=False, action='store_true', help='Keep the generated workspaces.')
+    # runs in a generated workspace, started by the release benchmark
+    worker_parser = subparsers.add_parser("release-worker")
+    worker_parser.add_argument('--addons', nargs='+', required=True)
+    worker_parser.add_argument('--repeat', default=5, type=int)
+    args = parser.parse_args()
+    if args.benchmark == "toposort":
+        benchmark_toposort(args.sizes, args.repeat, not args.no_compare)
+    elif args.benchmark == "release":
+        options = {"addons": args.addons, "fan_out": args.fan_out, "depth": args.depth, "assets": args.assets,
+                   "asset_kb": args.asset_kb, "seed": args.seed}
+        if not benchmark_release(args.sizes, args.repeat, options, args.baseline, args.save_baseline, args.threshold,
+                                 args.min_delta_ms, args.keep):
+            sys.exit(1)
+    elif args.benchmark == "release-worker":
+        print(json.dumps(measure_release_phases(args.addons, args.repeat)))
@@ -1,6 +1,9 @@
 import importlib
 import inspect
+import json
 import pkgutil
+import re
+import time
 import typing
 from pathlib import Path
 
@@ -14,13 +17,32 @@ __all__ = (
     "remove_properties",
 )
 
+from .startup_profile import is_profiling, measure, record
+from .toposort import toposort
 from ..types.framework import ExpandableUi, is_extension
 
 blender_version = bpy.app.version
 
+# written into the root of the addon when it is released, see common/class_loader/registration_manifest.py
+_REGISTRATION_MANIFEST_FILE = "registration_manifest.json"
+_REGISTRATION_MANIFEST_VERSION = 1
+
+# Only the modules of the addons folder are imported when discovering classes to register. Modules outside of it (e.g.
+# shared modules in the common folder) are imported when the addon imports them, unless they contain this line at the
+# top level, then their classes are registered as well.
+# 只有addons文件夹中的模块会被自动导入并注册其中的类 其他模块(如common中的工具模块)只在被插件使用时导入 除非模块中包含以下标记
+# __auto_load__ = True
+_ADDONS_PACKAGE = "addons"
+_registrable_module_pattern = re.compile(r"^__auto_load__\s*=\s*True\b", re.MULTILINE)
+# test modules are imported by the headless test runner only, keep in sync with framework._TEST_MODULE_PATTERN
+_test_module_pattern = re.compile(r"^test_")
+
 modules = None
 ordered_classes = None
 frame_work_classes = None
+# {"discovered": [module name], "imported": {module name: seconds to import}, "skipped": [module name],
+#  "compiled": [module name]} of the last discovery
+discovery_report = None
 
 
 def init():
@@ -28,23 +50,33 @@ def init():
     global ordered_classes
     global frame_work_classes
     # notice here, the path root is the root of the project
-    modules = get_all_submodules(Path(__file__).parent.parent.parent)
-    ordered_classes = get_ordered_classes_to_register(modules)
+    root = Path(__file__).parent.parent.parent
+    manifest = read_registration_manifest(root / _REGISTRATION_MANIFEST_FILE)
+    modules = get_all_submodules(root, manifest)
+    # use the registration order computed when the addon was released if it is still valid
+    # 优先使用发布时预先计算的注册顺序
+    ordered_classes = load_ordered_classes_from_manifest(manifest, modules)
+    if ordered_classes is None:
+        ordered_classes = get_ordered_classes_to_register(modules)
     frame_work_classes = get_framework_classes(modules)
 
 
 def register():
+    # timings are only recorded inside common.class_loader.startup_profile.startup_profile when profiling is enabled
     for cls in ordered_classes:
-        bpy.utils.register_class(cls)
+        with measure("register_class", f"{cls.__module__}.{cls.__qualname__}"):
+            bpy.utils.register_class(cls)
 
     for module in modules:
         if module.__name__ == __name__:
             continue
         if hasattr(module, "register"):
-            module.register()
+            with measure("register", module.__name__):
+                module.register()
 
     for cls in frame_work_classes:
-        register_framework_class(cls)
+        with measure("framework_class", f"{cls.__module__}.{cls.__qualname__}"):
+            register_framework_class(cls)
 
 def unregister():
     for cls in reversed(ordered_classes):
@@ -63,17 +95,64 @@ def unregister():
 # Import modules
 #################################################
 
-def get_all_submodules(directory):
-    return list(iter_submodules(directory))
+def get_all_submodules(directory, manifest: dict = None):
+    global discovery_report
+    discovery_report = {"discovered": [], "imported": {}, "skipped": [], "compiled": []}
+    for name in sorted(iter_submodule_names(directory)):
+        if _test_module_pattern.match(name.rpartition(".")[2]):
+            continue
+        if is_registrable_module(directory, name):
+            discovery_report["discovered"].append(name)
+        else:
+            discovery_report["skipped"].append(name)
+    # modules compiled when the addon was released (e.g. translation dictionaries) are not imported
+    compiled_modules = set()
+    if manifest and manifest.get("modules") == discovery_report["discovered"]:
+        compiled_modules = set(manifest.get("compiled_modules", []))
+    submodules = []
+    for name in discovery_report["discovered"]:
+        if name in compiled_modules:
+            discovery_report["compiled"].append(name)
+        else:
+            submodules.append(import_submodule(directory, name))
+    # only printed when profiling (e.g. test.py --profile), not every time users enable the addon
+    if is_profiling():
+        print_discovery_report()
+    return submodules
 
 
-def iter_submodules(path):
-    import_as_extension = is_extension()
-    for name in sorted(iter_submodule_names(path)):
-        if import_as_extension:
-            yield importlib.import_module("..." + name, __package__)
-        else:
-            yield importlib.import_module("." + name, path.name)
+def import_submodule(path, name):
+    start_time = time.perf_counter()
+    if is_extension():
+        module = importlib.import_module("..." + name, __package__)
+    else:
+        module = importlib.import_module("." + name, path.name)
+    # includes the modules imported by this module for the first time
+    discovery_report["imported"][name] = time.perf_counter() - start_time
+    record("import", module.__name__, discovery_report["imported"][name])
+    return module
+
+
+def is_registrable_module(path, name):
+    if name.split(".")[0] == _ADDONS_PACKAGE:
+        return True
+    try:
+        source = path.joinpath(*name.split(".")).with_suffix(".py").read_text(encoding="utf-8")
+    except (OSError, ValueError):
+        return False
+    return _registrable_module_pattern.search(source) is not None
+
+
+def print_discovery_report():
+    import_times = discovery_report["imported"]
+    slowest = sorted(import_times, key=import_times.get, reverse=True)[:3]
+    print(f"auto_load: imported {len(import_times)} modules in {sum(import_times.values()) * 1000:.1f} ms"
+          + (f" (slowest: {', '.join(f'{name} {import_times[name] * 1000:.1f} ms' for name in slowest)})"
+             if slowest else "")
+          + (f", skipped {len(discovery_report['skipped'])} modules outside the addon: "
+             + ", ".join(discovery_report["skipped"]) if discovery_report["skipped"] else "")
+          + (f", {len(discovery_report['compiled'])} compiled modules not imported"
+             if discovery_report["compiled"] else ""))
 
 
 def iter_submodule_names(path, root=""):
@@ -93,6 +172,59 @@ def get_ordered_classes_to_register(modules):
     return toposort(get_register_deps_dict(modules))
 
 
+def read_registration_manifest(manifest_file: Path):
+    # None if the addon was released without a registration manifest, an empty dict if it can not be used
+    if not manifest_file.is_file():
+        return None
+    try:
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == _REGISTRATION_MANIFEST_VERSION else {}
+
+
+def load_ordered_classes_from_manifest(manifest: dict, modules):
+    """
+    Get the ordered classes to register from the manifest written when the addon was released, return None if there
+    is no manifest or if it does not match the loaded modules.
+    Only cheap checks are done: the modules and the classes to register must be the same as the loaded ones, and the
+    order must respect inheritance, bl_parent_id and the annotations that are already evaluated.
+    """
+    if manifest is None:
+        return None
+    root_package = __name__.rsplit(".", 3)[0]
+    modules_by_name = {module.__name__[len(root_package) + 1:]: module for module in modules}
+    ordered_classes = None
+    if manifest.get("modules") == discovery_report["discovered"]:
+        ordered_classes = [getattr(modules_by_name.get(module_name), attribute, None)
+                           for module_name, attribute in manifest["classes"]]
+    if ordered_classes is None or not is_valid_registration_order(ordered_classes, set(iter_my_classes(modules))):
+        print("Registration manifest is outdated, discovering classes to register dynamically")
+        return None
+    return ordered_classes
+
+
+def is_valid_registration_order(ordered_classes, my_classes):
+    if len(ordered_classes) != len(my_classes) or set(ordered_classes) != my_classes:
+        return False
+    positions = {cls: i for i, cls in enumerate(ordered_classes)}
+    my_classes_by_idname = {cls.bl_idname: cls for cls in my_classes if hasattr(cls, "bl_idname")}
+    for cls in ordered_classes:
+        for dependency in iter_my_deps_from_inheritance(cls, my_classes):
+            if positions[dependency] > positions[cls]:
+                return False
+        for dependency in iter_my_deps_from_parent_id(cls, my_classes_by_idname):
+            if positions[dependency] > positions[cls]:
+                return False
+        # typing.get_type_hints is not called here, it evaluates the annotations of every class
+        for base_cls in cls.__mro__:
+            for value in base_cls.__dict__.get("__annotations__", {}).values():
+                dependency = get_dependency_from_annotation(value)
+                if dependency in my_classes and positions[dependency] > positions[cls]:
+                    return False
+    return True
+
+
 def get_framework_classes(modules):
     base_types = get_framework_base_classes()
     all_framework_classes = set()
@@ -188,33 +320,6 @@ def get_framework_base_classes():
     return {ExpandableUi}
 
 
-# Find order to register to solve dependencies
-#################################################
-
-def toposort(deps_dict):
-    sorted_list = []
-    sorted_values = set()
-    while len(deps_dict) > 0:
-        unsorted = []
-        # class with no dependencies
-        independent = []
-        for value, deps in deps_dict.items():
-            if len(deps) == 0:
-                independent.append(value)
-            else:
-                unsorted.append(value)
-
-        # sort no dependencies by _reg_order
-        independent.sort(key=lambda x: getattr(x, "_reg_order", float('inf')))
-        # add to sorted list
-        for value in independent:
-            sorted_list.append(value)
-            sorted_values.add(value)
-
-        deps_dict = {value: deps_dict[value] - sorted_values for value in unsorted}
-    return sorted_list
-
-
 def register_framework_class(cls):
     if issubclass(cls, ExpandableUi):
         if hasattr(bpy.types, cls.target_id):
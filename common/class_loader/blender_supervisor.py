@@ -0,0 +1,161 @@
+# Notice: Please do not use functions in this file for developing your Blender Addons, this file is for internal use of
+# the framework.
+# 注意：请不要在Blender中使用此文件中的函数,此文件用于框架内部使用
+import asyncio
+import collections
+import os
+import sys
+import time
+
+# Blender prints long lines, e.g. when dumping data, the default limit of asyncio streams is 64 KB
+_STREAM_LIMIT = 16 * 1024 * 1024
+# seconds to wait for a process to exit after terminate before killing it
+_TERMINATE_GRACE = 5
+
+
+class BlenderRun:
+    """
+    State of a Blender process started by BlenderSupervisor.
+    log keeps the last lines of both streams as (stream name, line) tuples, older lines are dropped.
+    """
+
+    def __init__(self, name: str, args: list, log_lines: int, prefix=""):
+        self.name = name
+        self.args = args
+        # written before every echoed line
+        self.prefix = prefix
+        self.log = collections.deque(maxlen=log_lines)
+        # number of lines written since the start, including the lines dropped from the log
+        self.line_count = 0
+        self.returncode = None
+        self.timed_out = False
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def duration(self) -> float:
+        if self.start_time is None:
+            return 0
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    def tail(self, count=50, stream=None) -> list:
+        lines = [line for line_stream, line in self.log if stream is None or line_stream == stream]
+        return lines[-count:]
+
+    def lines_since(self, line_count: int) -> list:
+        # lines written after line_count was read, as far as they are still in the log
+        new_lines = min(self.line_count - line_count, len(self.log))
+        return [line for _, line in list(self.log)[len(self.log) - new_lines:]] if new_lines > 0 else []
+
+
+class BlenderSupervisor:
+    """
+    Run Blender processes with asyncio: stdout and stderr of every process are drained concurrently so that a process
+    never blocks on a full pipe, the lines are echoed (prefixed with the name of the process when several processes
+    run at the same time) and kept in a bounded log, and each process can be given a timeout after which it is
+    terminated, then killed if it does not exit.
+    In traceback lines (`File "..."`), the paths of the staged addons are replaced by the paths in the workspace so
+    that they can be opened from the IDE.
+
+    Args:
+        path_remaps: {path in the Blender process: path in the workspace} applied to traceback lines of both streams.
+        log_lines: Number of lines kept in the log of each process.
+        echo: Whether to write the output of the processes to sys.stdout / sys.stderr.
+        inherit_stdout: Let the processes write to the stdout of this process instead of capturing it, for interactive
+                        sessions: Blender and its python block-buffer their output when stdout is a pipe, so it would
+                        only show up in bursts. Only stderr (where tracebacks go) is then remapped and logged.
+    """
+
+    def __init__(self, path_remaps: dict = None, log_lines=1000, echo=True, inherit_stdout=False):
+        self.path_remaps = dict(path_remaps or {})
+        self.log_lines = log_lines
+        self.echo = echo
+        self.inherit_stdout = inherit_stdout
+
+    def remap_line(self, line: str) -> str:
+        if line.lstrip().startswith("File"):
+            for source, target in self.path_remaps.items():
+                line = line.replace(source, target)
+        return line
+
+    async def run(self, args: list, name: str = None, timeout: float = None, env: dict = None, cwd: str = None,
+                  prefix_output=False, blender_run: BlenderRun = None) -> BlenderRun:
+        """
+        Run a process until it exits or times out, the process is terminated if the task is cancelled.
+        The echoed lines are prefixed with the name of the process if prefix_output is True.
+        The state is written into blender_run if it is given, so that it can be read while the process is running.
+        """
+        name = name or os.path.basename(str(args[0]))
+        run = blender_run or BlenderRun(name, args, self.log_lines)
+        run.prefix = f"[{name}] " if prefix_output else ""
+        process = await asyncio.create_subprocess_exec(*args, stdout=None if self.inherit_stdout
+                                                       else asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE, env=env, cwd=cwd,
+                                                       limit=_STREAM_LIMIT)
+        run.start_time = time.monotonic()
+        try:
+            drain = asyncio.gather(*([] if self.inherit_stdout else [self._drain(process.stdout, "stdout", run)]),
+                                   self._drain(process.stderr, "stderr", run))
+            try:
+                await asyncio.wait_for(asyncio.shield(drain), timeout)
+            except asyncio.TimeoutError:
+                run.timed_out = True
+                self._write(run, "stderr", f"Timed out after {timeout} s, terminating {run.name}\n")
+                await self._stop(process)
+                try:
+                    # the pipes may be kept open by processes started by Blender
+                    await asyncio.wait_for(drain, _TERMINATE_GRACE)
+                except asyncio.TimeoutError:
+                    pass
+            run.returncode = await process.wait()
+        finally:
+            run.end_time = time.monotonic()
+            if process.returncode is None:
+                # cancelled, e.g. by Ctrl+C
+                await asyncio.shield(self._stop(process))
+        return run
+
+    async def run_all(self, jobs: list) -> list:
+        """Run several processes at once, jobs are dicts of the arguments of run. Returns the BlenderRun of each job."""
+        return list(await asyncio.gather(*(self.run(**{"prefix_output": len(jobs) > 1, **job}) for job in jobs)))
+
+    async def _drain(self, stream: asyncio.StreamReader, stream_name: str, run: BlenderRun):
+        while True:
+            try:
+                data = await stream.readline()
+            except ValueError:
+                # a line longer than the limit, read what is buffered
+                data = await stream.read(_STREAM_LIMIT)
+            if not data:
+                return
+            self._write(run, stream_name, self.remap_line(data.decode("utf-8", errors="replace")))
+
+    def _write(self, run: BlenderRun, stream_name: str, line: str):
+        run.log.append((stream_name, line))
+        run.line_count += 1
+        if self.echo:
+            output = sys.stdout if stream_name == "stdout" else sys.stderr
+            output.write(run.prefix + line)
+            output.flush()
+
+    @staticmethod
+    async def _stop(process):
+        if process.returncode is not None:
+            return
+        try:
+            process.terminate()
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(process.wait(), _TERMINATE_GRACE)
+        except asyncio.TimeoutError:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+
+def run_blender(args: list, path_remaps: dict = None, timeout: float = None, env: dict = None, **options) -> BlenderRun:
+    # run a single process from synchronous code, options are passed to BlenderSupervisor
+    return asyncio.run(BlenderSupervisor(path_remaps, **options).run(args, timeout=timeout, env=env))
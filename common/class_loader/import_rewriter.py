@@ -0,0 +1,164 @@
+# Notice: Please do not use functions in this file for developing your Blender Addons, this file is for internal use of
+# the framework.
+# 注意：请不要在Blender中使用此文件中的函数,此文件用于框架内部使用
+import io
+import tokenize
+
+# tokens after which a new statement starts, "from" and "import" are hard keywords so they can only start a statement
+_STATEMENT_START_TOKENS = {tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING}
+_STATEMENT_START_OPS = {";", ":"}
+_IGNORED_TOKENS = {tokenize.COMMENT, tokenize.NL}
+
+
+class ImportRewriter:
+    """
+    Rewrite the absolute imports of the py files in a release folder in a single pass per file.
+    The released addon is not importable by the module names used in the workspace, so every absolute import of a
+    module inside the release is updated:
+    - For extensions, it is converted to a relative import, since extensions are installed under bl_ext.xxx.
+    - For legacy addons, it is prefixed with the namespace (the addon name), i.e. the name of the release folder.
+    Both `from a.b import c` (including the multi-line parenthesised form) and `import a.b.c [as d]` are handled.
+    Imports are found with the tokenizer, so strings and comments that look like imports are left untouched.
+
+    Args:
+        relative_paths: Paths of all files in the release folder, relative to the release folder.
+        namespace: The name of the release folder.
+        is_extension: Whether the addon is released as an extension.
+    """
+
+    def __init__(self, relative_paths, namespace: str, is_extension: bool):
+        self.namespace = namespace
+        self.is_extension = is_extension
+        # all files and folders in the release folder, "/" separated
+        self.paths = set()
+        # all importable module names in the release folder, e.g. "a", "a.b", "a.b.c" for a/b/c.py
+        self.py_modules = set()
+        for relative_path in relative_paths:
+            parts = relative_path.replace("\\", "/").split("/")
+            for i in range(1, len(parts) + 1):
+                self.paths.add("/".join(parts[:i]))
+            if parts[-1].endswith(".py"):
+                module_parts = parts[:-1] if parts[-1] == "__init__.py" else parts[:-1] + [parts[-1][:-3]]
+                for i in range(1, len(module_parts) + 1):
+                    self.py_modules.add(".".join(module_parts[:i]))
+
+    def rewrite(self, source: str, relative_path: str) -> str:
+        """Return source with its imports rewritten, relative_path is the path of the file in the release folder."""
+        bom = ""
+        if source.startswith("\ufeff"):
+            bom, source = "\ufeff", source[1:]
+        package_parts = relative_path.replace("\\", "/").split("/")[:-1]
+
+        line_offsets = [0]
+        for line in io.StringIO(source):
+            line_offsets.append(line_offsets[-1] + len(line))
+
+        def offset(position):
+            return line_offsets[position[0] - 1] + position[1]
+
+        tokens = list(tokenize.generate_tokens(io.StringIO(source).readline))
+        edits = []
+        statement_start = True
+        for i, token in enumerate(tokens):
+            if statement_start and token.type == tokenize.NAME:
+                if token.string == "from":
+                    edits.extend(self._rewrite_from_statement(tokens, i + 1, package_parts, offset))
+                elif token.string == "import":
+                    edits.extend(self._rewrite_import_statement(tokens, i, package_parts, offset))
+            if token.type not in _IGNORED_TOKENS:
+                statement_start = token.type in _STATEMENT_START_TOKENS or (
+                        token.type == tokenize.OP and token.string in _STATEMENT_START_OPS)
+
+        if len(edits) == 0:
+            return bom + source
+        result = []
+        last_end = 0
+        for start, end, replacement in edits:
+            result.append(source[last_end:start])
+            result.append(replacement)
+            last_end = end
+        result.append(source[last_end:])
+        return bom + "".join(result)
+
+    def _rewrite_from_statement(self, tokens, index, package_parts, offset):
+        # from a.b import c -> only the module name a.b is replaced
+        module_tokens = []
+        while not (tokens[index].type == tokenize.NAME and tokens[index].string == "import"):
+            module_tokens.append(tokens[index])
+            index += 1
+        if len(module_tokens) == 0 or module_tokens[0].type != tokenize.NAME:
+            # relative import
+            return []
+        module_name = "".join(token.string for token in module_tokens)
+        if self.is_extension and self._exists(module_name):
+            replacement = self._relative_module(module_name.split("."), package_parts)
+        elif module_name in self.py_modules:
+            replacement = f"{self.namespace}.{module_name}"
+        else:
+            return []
+        return [(offset(module_tokens[0].start), offset(module_tokens[-1].end), replacement)]
+
+    def _rewrite_import_statement(self, tokens, index, package_parts, offset):
+        # import a.b.c as d, e -> the whole statement is replaced if any of the modules is in the release
+        aliases = []
+        import_token = tokens[index]
+        index += 1
+        while True:
+            name_tokens = []
+            while tokens[index].type == tokenize.NAME or tokens[index].string == ".":
+                if tokens[index].string == "as" and len(name_tokens) > 0:
+                    break
+                name_tokens.append(tokens[index])
+                index += 1
+            alias = None
+            if tokens[index].string == "as":
+                alias = tokens[index + 1].string
+                index += 2
+            aliases.append(("".join(token.string for token in name_tokens), alias))
+            end_token = tokens[index - 1]
+            if tokens[index].string != ",":
+                break
+            index += 1
+
+        statements = [self._import_statement(module_name, alias, package_parts) for module_name, alias in aliases]
+        if all(statement is None for statement in statements):
+            return []
+        for i, (module_name, alias) in enumerate(aliases):
+            if statements[i] is None:
+                statements[i] = f"import {module_name}" if alias is None else f"import {module_name} as {alias}"
+        return [(offset(import_token.start), offset(end_token.end), "; ".join(statements))]
+
+    def _import_statement(self, module_name, alias, package_parts):
+        if self.is_extension:
+            if not self._exists(module_name):
+                return None
+        elif module_name not in self.py_modules:
+            return None
+        module_parts = module_name.split(".")
+        if self.is_extension:
+            parent = self._relative_module(module_parts[:-1], package_parts)
+        else:
+            parent = ".".join([self.namespace] + module_parts[:-1])
+        if alias is not None:
+            # import a.b.c as d -> from <parent of a.b.c> import c as d
+            return f"from {parent} import {module_parts[-1]} as {alias}"
+        if len(module_parts) == 1:
+            return f"from {parent} import {module_name}"
+        # import a.b.c binds "a" after importing a.b.c
+        if self.is_extension:
+            level = len(package_parts) + 1
+            return f'{module_parts[0]} = __import__("{module_name}", globals(), None, (), {level})'
+        return f'{module_parts[0]} = __import__("{self.namespace}.{module_name}").{module_parts[0]}'
+
+    def _exists(self, module_name):
+        module_path = module_name.replace(".", "/")
+        return module_path in self.paths or module_path + ".py" in self.paths
+
+    @staticmethod
+    def _relative_module(module_parts, package_parts):
+        common = 0
+        while (common < len(module_parts) and common < len(package_parts)
+               and module_parts[common] == package_parts[common]):
+            common += 1
+        levels_up = len(package_parts) - common
+        return "." * (levels_up + 1) + ".".join(module_parts[common:])
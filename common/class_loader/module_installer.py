@@ -3,6 +3,7 @@
 # 注意：请不要在Blender中使用此文件中的函数,此文件用于框架内部使用,包含了一些Blender官方禁止在插件中使用的模块 如sys
 import importlib.metadata
 import importlib.util
+import json
 import os
 import platform
 import subprocess
@@ -33,7 +34,59 @@ def install_if_missing(package):
         install(package)
 
 
+# Probing the version starts Blender, which takes seconds. The versions are cached by the path, size and modification
+# time of the executable, so Blender is only started again when it is replaced.
+# keep in sync with framework._CACHE_FOLDER
+# 获取版本需要启动Blender 按可执行文件的路径、大小和修改时间缓存版本号 仅在Blender被替换后重新获取
+_VERSION_CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                   ".framework_cache", "blender_versions.json")
+# the cache file loaded in this process, {executable path: {"size", "mtime_ns", "version"}}
+_version_cache = None
+
+
+def _load_version_cache() -> dict:
+    global _version_cache
+    if _version_cache is None:
+        try:
+            with open(_VERSION_CACHE_FILE, "r", encoding="utf-8") as f:
+                _version_cache = json.load(f)
+        except (OSError, ValueError):
+            _version_cache = {}
+        if not isinstance(_version_cache, dict):
+            _version_cache = {}
+    return _version_cache
+
+
+def _save_version_cache(cache: dict):
+    try:
+        os.makedirs(os.path.dirname(_VERSION_CACHE_FILE), exist_ok=True)
+        # write to a temp file first so that other processes never read a half written cache
+        temp_file = f"{_VERSION_CACHE_FILE}.{os.getpid()}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=1)
+        os.replace(temp_file, _VERSION_CACHE_FILE)
+    except OSError as e:
+        print(f"Could not save the Blender version cache: {e}")
+
+
 def get_blender_version(blender_exe_path):
+    try:
+        exe_path = os.path.abspath(blender_exe_path)
+        exe_stat = os.stat(exe_path)
+    except (OSError, TypeError, ValueError):
+        return probe_blender_version(blender_exe_path)
+    cache = _load_version_cache()
+    entry = cache.get(exe_path)
+    if entry is not None and entry.get("size") == exe_stat.st_size and entry.get("mtime_ns") == exe_stat.st_mtime_ns:
+        return entry.get("version")
+    version = probe_blender_version(blender_exe_path)
+    if version is not None:
+        cache[exe_path] = {"size": exe_stat.st_size, "mtime_ns": exe_stat.st_mtime_ns, "version": version}
+        _save_version_cache(cache)
+    return version
+
+
+def probe_blender_version(blender_exe_path):
     try:
         # Run the Blender executable with --version
         result = subprocess.run(
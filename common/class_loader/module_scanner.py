@@ -0,0 +1,179 @@
+# Notice: Please do not use functions in this file for developing your Blender Addons, this file is for internal use of
+# the framework. It is kept free of side effects so that it can be imported cheaply by worker processes.
+# 注意：请不要在Blender中使用此文件中的函数,此文件用于框架内部使用,不包含任何副作用以便在子进程中快速导入
+import ast
+import hashlib
+import os
+
+from ..io.FileManagerClient import DEFAULT_EXCLUDES, ExcludeRules
+
+
+def parse_imported_modules(source, file_path):
+    root = ast.parse(source, filename=file_path)
+
+    imported_modules = set()
+    for node in ast.walk(root):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported_modules.add(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            if node.module:
+                module_name = node.module
+                imported_modules.add(module_name)
+            for alias in node.names:
+                if node.module:
+                    imported_modules.add(f"{node.module}.{alias.name}")
+                else:
+                    imported_modules.add(alias.name)
+    return imported_modules
+
+
+def parse_imported_modules_in_file(file_path) -> list:
+    # entry point of the process pool used by framework.find_all_dependencies
+    with open(file_path, mode="r", encoding="utf-8") as f:
+        source = f.read()
+    try:
+        return sorted(parse_imported_modules(source, file_path))
+    except SyntaxError as e:
+        raise SyntaxError(f"Syntax error in file {file_path}: {e}")
+
+
+class ModuleIndex:
+    """
+    Index of all packages (folders) and py modules under project_root, built with a single walk of the project.
+    It answers module resolutions with dict lookups instead of probing the filesystem for every import.
+    Paths in the index are relative to project_root and separated by "/", the project root itself is "".
+    Hidden folders and __pycache__ are skipped since they can never be imported, as well as the folders excluded by
+    excludes, by default virtual environments (e.g. venv/), whose packages are not resolved against project_root.
+    """
+
+    def __init__(self, project_root: str, excludes: ExcludeRules = DEFAULT_EXCLUDES):
+        self.project_root = os.path.abspath(project_root)
+        self.packages = set()
+        self.modules = set()
+        self._resolved = {}
+        for root, dirnames, filenames in os.walk(self.project_root):
+            relative_root = self._relative_dir(root)
+            dirnames[:] = [d for d in dirnames if not d.startswith(".") and d != "__pycache__"
+                           and not excludes.is_excluded_folder(_join_module_path(relative_root, d),
+                                                               os.path.join(root, d))]
+            self.packages.add(relative_root)
+            for filename in filenames:
+                if filename.endswith(".py"):
+                    self.modules.add(_join_module_path(relative_root, filename[:-3]))
+
+    def layout_key(self) -> str:
+        # changes whenever a py file or a folder is added or removed
+        layout = "\n".join(sorted(self.packages)) + "\n\n" + "\n".join(sorted(self.modules))
+        return hashlib.md5(layout.encode("utf-8")).hexdigest()
+
+    def resolve(self, module_name: str, base_path: str) -> list:
+        """
+        Resolve an imported module name of the file base_path to the py files it refers to.
+        An absolute module under project_root is preferred, otherwise the module is searched in the folder of
+        base_path and then its parent folders up to project_root. A single name module (most likely a relative import
+        like `from . import xxx`) returns every module with this name along the way.
+        """
+        base_dir = os.path.dirname(os.path.abspath(base_path))
+        key = (module_name, base_dir)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = self._resolve(module_name, base_dir)
+            self._resolved[key] = resolved
+        return list(resolved)
+
+    def _resolve(self, module_name: str, base_dir: str) -> list:
+        import_all = module_name.endswith(".*")
+        if import_all:
+            module_name = module_name[:-2]
+        module_path = module_name.replace(".", "/")
+        found = self._find(module_path, "")
+        if found is not None:
+            return [found]
+        search_dirs = self._search_dirs(base_dir)
+        if not import_all and "." not in module_name:
+            return [self._absolute_path(_join_module_path(search_dir, module_path) + ".py")
+                    for search_dir in search_dirs if _join_module_path(search_dir, module_path) in self.modules]
+        for search_dir in search_dirs:
+            found = self._find(module_path, search_dir)
+            if found is not None:
+                return [found]
+        return []
+
+    def _find(self, module_path: str, search_dir: str):
+        candidate = _join_module_path(search_dir, module_path)
+        if candidate in self.packages:
+            return self._absolute_path(candidate + "/__init__.py")
+        if candidate in self.modules:
+            return self._absolute_path(candidate + ".py")
+        return None
+
+    def _search_dirs(self, base_dir: str) -> list:
+        # base_dir and all its parent folders up to project_root, empty if base_dir is not inside project_root
+        relative_dir = self._relative_dir(base_dir)
+        if relative_dir is None:
+            return []
+        search_dirs = [relative_dir]
+        while relative_dir != "":
+            relative_dir = relative_dir.rpartition("/")[0]
+            search_dirs.append(relative_dir)
+        return search_dirs
+
+    def _relative_dir(self, path: str):
+        try:
+            relative_dir = os.path.relpath(path, self.project_root)
+        except ValueError:
+            # on a different drive
+            return None
+        if relative_dir == ".":
+            return ""
+        relative_dir = relative_dir.replace(os.sep, "/")
+        if relative_dir == ".." or relative_dir.startswith("../"):
+            return None
+        return relative_dir
+
+    def _absolute_path(self, relative_path: str) -> str:
+        return os.path.join(self.project_root, *relative_path.split("/"))
+
+
+def _join_module_path(search_dir: str, module_path: str) -> str:
+    return module_path if search_dir == "" else search_dir + "/" + module_path
+
+
+def parse_absolute_imports(source, file_path, package: str) -> set:
+    """
+    Absolute names of the modules (and possibly attributes) imported by a file, relative imports are resolved against
+    package, the __package__ of the file. `__import__` calls with constant arguments are included as well.
+    """
+    root = ast.parse(source, filename=file_path)
+    package_parts = package.split(".") if package else []
+
+    def absolute_name(module, level):
+        if level == 0:
+            return module
+        if level - 1 > len(package_parts):
+            return None
+        base = package_parts[:len(package_parts) - (level - 1)]
+        return ".".join(base + ([module] if module else []))
+
+    imported_modules = set()
+    for node in ast.walk(root):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported_modules.add(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            module_name = absolute_name(node.module, node.level)
+            if module_name:
+                imported_modules.add(module_name)
+                for alias in node.names:
+                    imported_modules.add(f"{module_name}.{alias.name}")
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "__import__"
+              and len(node.args) > 0 and isinstance(node.args[0], ast.Constant)
+              and isinstance(node.args[0].value, str)):
+            level = 0
+            if len(node.args) > 4 and isinstance(node.args[4], ast.Constant) and isinstance(node.args[4].value, int):
+                level = node.args[4].value
+            module_name = absolute_name(node.args[0].value, level)
+            if module_name:
+                imported_modules.add(module_name)
+    return imported_modules
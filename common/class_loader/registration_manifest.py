@@ -0,0 +1,255 @@
+# Notice: Please do not use functions in this file for developing your Blender Addons, this file is for internal use of
+# the framework.
+# 注意：请不要在Blender中使用此文件中的函数,此文件用于框架内部使用
+import ast
+import re
+
+from .toposort import toposort
+
+# written into the root of the released addon, read by auto_load.load_ordered_classes_from_manifest
+REGISTRATION_MANIFEST_FILE = "registration_manifest.json"
+REGISTRATION_MANIFEST_VERSION = 1
+
+# keep in sync with auto_load.get_register_base_types
+_REGISTER_BASE_TYPES = {"bpy.types." + name for name in [
+    "Panel", "Operator", "PropertyGroup",
+    "AddonPreferences", "Header", "Menu",
+    "Node", "NodeSocket", "NodeTree",
+    "UIList", "RenderEngine",
+    "Gizmo", "GizmoGroup",
+]}
+_PANEL_TYPE = "bpy.types.Panel"
+# keep in sync with auto_load.is_registrable_module and auto_load._test_module_pattern
+_ADDONS_PACKAGE = "addons"
+_registrable_module_pattern = re.compile(r"^__auto_load__\s*=\s*True\b", re.MULTILINE)
+_test_module_pattern = re.compile(r"^test_")
+_DEFERRED_PROPERTIES = {"PointerProperty", "CollectionProperty"}
+
+
+def build_registration_manifest(py_sources: dict, compiled_modules=()) -> dict:
+    """
+    Statically compute the order in which auto_load registers the classes of a released addon, without importing it.
+    It follows the same rules as auto_load.get_ordered_classes_to_register: a class is registered after the classes of
+    the addon it inherits from, the PropertyGroups it refers to through PointerProperty / CollectionProperty
+    annotations and the panel named by its bl_parent_id, classes without dependencies between them are ordered by
+    reg_order.
+    Anything that can not be resolved statically is simply left out, auto_load checks the manifest against the loaded
+    classes and discovers them dynamically if they do not match.
+
+    Args:
+        py_sources: {path of the py file relative to the release folder, "/" separated: source code}
+        compiled_modules: Names of the modules compiled into data files by the release, e.g. translation dictionaries,
+                          auto_load does not import them.
+
+    Returns:
+        dict: {"version", "modules": names of the modules auto_load imports,
+               "classes": [[module name, attribute name], ...] in registration order,
+               "compiled_modules": names of the modules auto_load skips}
+    """
+    scanner = _ClassScanner(py_sources)
+    return {
+        "version": REGISTRATION_MANIFEST_VERSION,
+        "modules": sorted(scanner.submodules),
+        "classes": [[module_name, attribute] for module_name, attribute in scanner.ordered_classes()],
+        "compiled_modules": sorted(set(compiled_modules) & scanner.submodules),
+    }
+
+
+def _module_name(relative_path):
+    parts = relative_path[:-len(".py")].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+class _ClassScanner:
+
+    def __init__(self, py_sources: dict):
+        self.trees = {}
+        self.packages = set()
+        registrable_modules = set()
+        for relative_path, source in py_sources.items():
+            module_name = _module_name(relative_path)
+            if module_name == "":
+                # the root __init__.py is the bootstrap file, it is not imported by auto_load
+                continue
+            self.trees[module_name] = ast.parse(source.lstrip("\ufeff"), filename=relative_path)
+            if relative_path.endswith("/__init__.py"):
+                self.packages.add(module_name)
+            if module_name.split(".")[0] == _ADDONS_PACKAGE or _registrable_module_pattern.search(source):
+                registrable_modules.add(module_name)
+        # modules imported by auto_load.iter_submodules: plain modules in folders that are all packages, in the addons
+        # folder or marked with __auto_load__ = True
+        self.submodules = set()
+        for module_name in self.trees:
+            if (module_name in self.packages or module_name not in registrable_modules
+                    or _test_module_pattern.match(module_name.rpartition(".")[2])):
+                continue
+            parents = module_name.split(".")[:-1]
+            if all(".".join(parents[:i]) in self.packages for i in range(1, len(parents) + 1)):
+                self.submodules.add(module_name)
+        # module name -> {bound name: binding}, binding is ("class", module, name), ("module", module) or
+        # ("from", module, name)
+        self.symbols = {module_name: self._collect_symbols(module_name, tree)
+                        for module_name, tree in self.trees.items()}
+        self.class_nodes = {}
+        for module_name, tree in self.trees.items():
+            for node in tree.body:
+                if isinstance(node, ast.ClassDef):
+                    self.class_nodes[(module_name, node.name)] = node
+
+    def _collect_symbols(self, module_name, tree):
+        package = module_name if module_name in self.packages else module_name.rpartition(".")[0]
+        symbols = {}
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                symbols[node.name] = ("class", module_name, node.name)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname is None:
+                        symbols[alias.name.split(".")[0]] = ("module", alias.name.split(".")[0])
+                    else:
+                        symbols[alias.asname] = ("module", alias.name)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level > 0:
+                    base = package.split(".") if package else []
+                    base = base[:len(base) - node.level + 1]
+                    imported_module = ".".join(base + ([node.module] if node.module else []))
+                else:
+                    imported_module = node.module
+                for alias in node.names:
+                    if alias.name != "*":
+                        symbols[alias.asname or alias.name] = ("from", imported_module, alias.name)
+        return symbols
+
+    def resolve(self, module_name, node, visiting=None):
+        # resolve a Name / Attribute expression to ("class", module, name) of the addon or to a dotted external name
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.insert(0, node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return None
+        return self._resolve_parts(module_name, [node.id] + parts, visiting or set())
+
+    def _resolve_parts(self, module_name, parts, visiting):
+        if (module_name, parts[0]) in visiting:
+            return None
+        visiting.add((module_name, parts[0]))
+        binding = self.symbols.get(module_name, {}).get(parts[0])
+        if binding is None:
+            return ".".join(parts)
+        if binding[0] == "class":
+            return binding if len(parts) == 1 else None
+        if binding[0] == "module":
+            return self._resolve_in_module(binding[1], parts[1:], visiting)
+        imported_module, name = binding[1], binding[2]
+        submodule = f"{imported_module}.{name}" if imported_module else name
+        if submodule in self.trees:
+            return self._resolve_in_module(submodule, parts[1:], visiting)
+        if imported_module in self.trees:
+            return self._resolve_parts(imported_module, [name] + parts[1:], visiting)
+        return ".".join([imported_module, name] + parts[1:])
+
+    def _resolve_in_module(self, module_name, parts, visiting):
+        if module_name not in self.trees:
+            return ".".join([module_name] + parts)
+        if len(parts) == 0:
+            return None
+        if f"{module_name}.{parts[0]}" in self.trees and parts[0] not in self.symbols[module_name]:
+            return self._resolve_in_module(f"{module_name}.{parts[0]}", parts[1:], visiting)
+        return self._resolve_parts(module_name, parts, visiting)
+
+    def bases(self, cls):
+        node = self.class_nodes.get(cls[1:])
+        return [] if node is None else [self.resolve(cls[1], base) for base in node.bases]
+
+    def ancestors(self, cls):
+        # external base names and classes of the addon this class inherits from, depth first
+        result = []
+        stack = list(reversed(self.bases(cls)))
+        seen = set()
+        while stack:
+            base = stack.pop()
+            if base is None or base in seen:
+                continue
+            seen.add(base)
+            result.append(base)
+            if isinstance(base, tuple):
+                stack.extend(reversed(self.bases(base)))
+        return result
+
+    def class_attribute(self, cls, attribute):
+        # value of a constant class attribute, looked up through the classes of the addon it inherits from
+        for owner in [cls] + [base for base in self.ancestors(cls) if isinstance(base, tuple)]:
+            node = self.class_nodes.get(owner[1:])
+            if node is None:
+                continue
+            if attribute == "_reg_order":
+                for decorator in node.decorator_list:
+                    if (isinstance(decorator, ast.Call) and len(decorator.args) == 1
+                            and isinstance(decorator.args[0], ast.Constant)
+                            and str(self.resolve(owner[1], decorator.func)).endswith("reg_order")):
+                        return decorator.args[0].value
+            for statement in node.body:
+                if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                        and isinstance(statement.targets[0], ast.Name) and statement.targets[0].id == attribute):
+                    return statement.value.value if isinstance(statement.value, ast.Constant) else None
+        return None
+
+    def annotation_dependencies(self, cls):
+        # annotations are inherited, the same as typing.get_type_hints
+        for owner in [cls] + [base for base in self.ancestors(cls) if isinstance(base, tuple)]:
+            node = self.class_nodes.get(owner[1:])
+            if node is None:
+                continue
+            for statement in node.body:
+                if not isinstance(statement, ast.AnnAssign) or not isinstance(statement.annotation, ast.Call):
+                    continue
+                function = statement.annotation.func
+                function_name = function.attr if isinstance(function, ast.Attribute) else getattr(function, "id", None)
+                if function_name not in _DEFERRED_PROPERTIES:
+                    continue
+                for keyword in statement.annotation.keywords:
+                    if keyword.arg == "type":
+                        dependency = self.resolve(owner[1], keyword.value)
+                        if isinstance(dependency, tuple):
+                            yield dependency
+
+    def ordered_classes(self):
+        # classes of the addon bound in the modules imported by auto_load, by the first (module, name) they are bound to
+        my_classes = {}
+        for module_name in sorted(self.submodules):
+            for name in self.symbols[module_name]:
+                cls = self._resolve_parts(module_name, [name], set())
+                if isinstance(cls, tuple) and cls[1:] in self.class_nodes and cls not in my_classes:
+                    if any(base in _REGISTER_BASE_TYPES for base in self.ancestors(cls)):
+                        my_classes[cls] = (module_name, name)
+
+        classes_by_idname = {}
+        for cls in my_classes:
+            idname = self.class_attribute(cls, "bl_idname")
+            if isinstance(idname, str):
+                classes_by_idname[idname] = cls
+        deps_dict = {}
+        for cls in my_classes:
+            ancestors = self.ancestors(cls)
+            deps = {base for base in ancestors if base in my_classes}
+            deps.update(dependency for dependency in self.annotation_dependencies(cls) if dependency in my_classes)
+            if _PANEL_TYPE in ancestors:
+                parent = classes_by_idname.get(self.class_attribute(cls, "bl_parent_id"))
+                if parent is not None:
+                    deps.add(parent)
+            deps.discard(cls)
+            deps_dict[cls] = deps
+
+        def order_key(cls):
+            order = self.class_attribute(cls, "_reg_order")
+            return (order if isinstance(order, (int, float)) else float("inf"), my_classes[cls])
+
+        try:
+            ordered = toposort(deps_dict, order_key)
+        except ValueError:
+            # dependency cycle, auto_load reports it when the addon is enabled
+            return []
+        return [my_classes[cls] for cls in ordered]
@@ -0,0 +1,95 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+__all__ = (
+    "startup_profile",
+    "measure",
+    "record",
+    "is_profiling",
+)
+
+# Set this environment variable to the path of a json file to profile the register of addons, test.py --profile sets it
+# for the Blender process it starts. Nothing is measured when it is not set.
+# 将此环境变量设置为json文件路径以分析插件启用的耗时 未设置时不进行任何统计
+PROFILE_ENV = "BLENDER_ADDON_STARTUP_PROFILE"
+# import: modules imported by auto_load, register_class: bpy.utils.register_class of each class, register: register()
+# of each module, framework_class: ExpandableUi draw functions, i18n: loading and registering translations
+SECTIONS = ("import", "register_class", "register", "framework_class", "i18n")
+
+# {section: {name: seconds}} while an addon is being registered with profiling enabled
+_active_profile = None
+
+
+@contextmanager
+def startup_profile(addon_name: str):
+    """
+    Profile the register of an addon if the PROFILE_ENV environment variable is set, the json report is written and a
+    summary is printed when the block exits.
+
+    Example:
+        def register():
+            with startup_profile(__addon_name__):
+                auto_load.init()
+                auto_load.register()
+    """
+    global _active_profile
+    report_file = os.environ.get(PROFILE_ENV)
+    if not report_file or _active_profile is not None:
+        yield
+        return
+    _active_profile = {section: {} for section in SECTIONS}
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile, _active_profile = _active_profile, None
+        report = {
+            "addon": addon_name,
+            "created": time.time(),
+            "total_ms": round((time.perf_counter() - start_time) * 1000, 3),
+            "sections": {section: {name: round(seconds * 1000, 3) for name, seconds in entries.items()}
+                         for section, entries in profile.items()},
+        }
+        try:
+            with open(report_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=1)
+        except OSError as e:
+            print("Failed to write the startup profile:", e)
+        print_startup_profile(report)
+
+
+@contextmanager
+def measure(section: str, name: str):
+    # add the time spent in the block to the profile, does nothing if the addon is not being profiled
+    if _active_profile is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(section, name, time.perf_counter() - start_time)
+
+
+def is_profiling() -> bool:
+    # True while an addon is being registered with profiling enabled, used to print extra diagnostics
+    return _active_profile is not None
+
+
+def record(section: str, name: str, seconds: float):
+    if _active_profile is not None:
+        entries = _active_profile[section]
+        entries[name] = entries.get(name, 0) + seconds
+
+
+def print_startup_profile(report: dict, limit=15):
+    sections = report["sections"]
+    print(f"Startup profile of {report['addon']}: {report['total_ms']:.1f} ms in total ("
+          + ", ".join(f"{section} {sum(entries.values()):.1f} ms" for section, entries in sections.items() if entries)
+          + ")")
+    slowest = sorted(((milliseconds, section, name) for section, entries in sections.items()
+                      for name, milliseconds in entries.items()), reverse=True)
+    for milliseconds, section, name in slowest[:limit]:
+        print(f"{milliseconds:>10.2f} ms  {section:<15} {name}")
@@ -0,0 +1,61 @@
+import heapq
+
+
+def get_reg_order(value):
+    # classes decorated by common.types.framework.reg_order, classes without it come last
+    return getattr(value, "_reg_order", float('inf'))
+
+
+def toposort(deps_dict: dict, order_key=get_reg_order) -> list:
+    """
+    Sort the keys of deps_dict ({value: set of values it depends on}) so that every value comes after its dependencies.
+    Values are placed by rounds: a round holds the values whose dependencies are all in previous rounds, and values of a
+    round are sorted by order_key, ties keep the order of deps_dict. Dependencies that are not keys of deps_dict are
+    ignored.
+    Runs in O((V + E) log V) with Kahn's algorithm, the round of a value is known when its last dependency is placed.
+    Raises ValueError naming the classes of a dependency cycle if there is one.
+    """
+    index = {value: i for i, value in enumerate(deps_dict)}
+    dependents = {value: [] for value in deps_dict}
+    remaining_deps = {}
+    for value, deps in deps_dict.items():
+        known_deps = {dep for dep in deps if dep in index and dep != value}
+        remaining_deps[value] = len(known_deps)
+        for dep in known_deps:
+            dependents[dep].append(value)
+
+    rounds = {}
+    queue = []
+    for value, count in remaining_deps.items():
+        if count == 0:
+            rounds[value] = 0
+            queue.append((0, order_key(value), index[value], value))
+    heapq.heapify(queue)
+
+    sorted_list = []
+    while queue:
+        current_round, _, _, value = heapq.heappop(queue)
+        sorted_list.append(value)
+        for dependent in dependents[value]:
+            rounds[dependent] = max(rounds.get(dependent, 0), current_round + 1)
+            remaining_deps[dependent] -= 1
+            if remaining_deps[dependent] == 0:
+                heapq.heappush(queue, (rounds[dependent], order_key(dependent), index[dependent], dependent))
+
+    if len(sorted_list) < len(deps_dict):
+        cycle = find_cycle({value: deps for value, deps in deps_dict.items() if remaining_deps[value] > 0})
+        raise ValueError("Can not register classes with a dependency cycle: "
+                         + " -> ".join(getattr(value, "__qualname__", str(value)) for value in cycle))
+    return sorted_list
+
+
+def find_cycle(deps_dict: dict) -> list:
+    # every value left by toposort depends on another value left, following them always ends in a cycle
+    path = []
+    positions = {}
+    value = next(iter(deps_dict))
+    while value not in positions:
+        positions[value] = len(path)
+        path.append(value)
+        value = next(dep for dep in deps_dict[value] if dep in deps_dict and dep != value)
+    return path[positions[value]:] + [value]
@@ -0,0 +1,65 @@
+# Notice: Please do not use functions in this file for developing your Blender Addons, this file is for internal use of
+# the framework.
+# 注意：请不要在Blender中使用此文件中的函数,此文件用于框架内部使用
+import json
+
+# written into the root of the released addon, keep in sync with common.i18n.i18n.load_catalog
+TRANSLATION_CATALOG_FOLDER = "i18n_catalogs"
+TRANSLATION_CATALOG_INDEX = "index.json"
+TRANSLATION_CATALOG_VERSION = 1
+# context of the msgids translated the same way in the "*" and "Operator" contexts, see preprocess_dictionary
+_ANY_CONTEXT = ""
+
+
+def merge_dictionaries(base_dictionary: dict, *additional_dictionaries: dict) -> dict:
+    # the same as common.i18n.i18n.load_dictionary, languages sharing a dictionary (e.g. zh_CN and zh_HANS) still
+    # share it
+    merged = {}
+    copies = {}
+    for language_code, translations in base_dictionary.items():
+        if id(translations) not in copies:
+            copies[id(translations)] = dict(translations)
+        merged[language_code] = copies[id(translations)]
+    for additional_dictionary in additional_dictionaries:
+        for language_code, translations in additional_dictionary.items():
+            merged.setdefault(language_code, {}).update(translations)
+    return merged
+
+
+def compile_translation_catalogs(dictionary: dict) -> dict:
+    """
+    Compile a translation dictionary ({language code: {(context, msgid): translation}}) into one catalog per language,
+    so that the released addon only loads the translations of the active language.
+    A catalog is a json list of [context, msgid, translation], a msgid translated the same way in the "*" and
+    "Operator" contexts is stored once with an empty context. Languages sharing a dictionary share a catalog.
+
+    Returns:
+        dict: {path relative to the release folder, "/" separated: content}, including the index of the catalogs
+              {"version", "languages": {language code: catalog file name}}
+    """
+    files = {}
+    languages = {}
+    catalog_names = {}
+    for language_code, translations in dictionary.items():
+        if id(translations) not in catalog_names:
+            catalog_names[id(translations)] = f"{language_code}.json"
+            files[f"{TRANSLATION_CATALOG_FOLDER}/{language_code}.json"] = json.dumps(
+                _compact_entries(translations), ensure_ascii=False, separators=(",", ":"))
+        languages[language_code] = catalog_names[id(translations)]
+    files[f"{TRANSLATION_CATALOG_FOLDER}/{TRANSLATION_CATALOG_INDEX}"] = json.dumps(
+        {"version": TRANSLATION_CATALOG_VERSION, "languages": languages}, indent=1)
+    return files
+
+
+def _compact_entries(translations: dict) -> list:
+    entries = []
+    for key, translation in translations.items():
+        if not isinstance(key, tuple) or len(key) != 2:
+            continue
+        context, msgid = key
+        if context == "Operator" and translations.get(("*", msgid)) == translation:
+            continue
+        if context == "*" and translations.get(("Operator", msgid)) == translation:
+            context = _ANY_CONTEXT
+        entries.append([context, msgid, translation])
+    return entries
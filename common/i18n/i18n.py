@@ -1,9 +1,56 @@
+import json
+from pathlib import Path
+
 import bpy
 
+from ..class_loader.startup_profile import measure
+
 # Get the language code when addon start up
 __language_code__ = bpy.context.preferences.view.language
 
-from .dictionary import common_dictionary
+# Index of __dictionary__ for i18n: {language code: {msgid: translation}}, rebuilt by set_dictionary and load_dictionary
+__index__ = {}
+# Translations of the active language, updated when the language is changed in the preferences
+__translations__ = {}
+
+# owner of the message bus subscription to language changes
+_language_subscription_owner = object()
+# name the translations are registered with in Blender by register_translations
+_registered_addon_name = None
+
+# Translation catalogs compiled when the addon was released, only the catalog of the active language is loaded.
+# keep in sync with common.class_loader.translation_catalog
+# 发布时编译的翻译目录 只加载当前语言的翻译
+_CATALOG_FOLDER = Path(__file__).parent.parent.parent / "i18n_catalogs"
+_CATALOG_VERSION = 1
+_ANY_CONTEXT = ""
+
+
+def _read_catalog_index():
+    # {language code: catalog file name}, None when the addon is not released with compiled catalogs
+    try:
+        index = json.loads((_CATALOG_FOLDER / "index.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return index.get("languages") if index.get("version") == _CATALOG_VERSION else None
+
+
+__catalogs__ = _read_catalog_index()
+_loaded_catalogs = set()
+
+
+def has_compiled_catalogs() -> bool:
+    return __catalogs__ is not None
+
+
+# The released addon loads the catalog of the active language only. The dictionary module is left out of the release
+# unless the addon imports it, addons made from the older template register common_dictionary themselves, so it stays
+# the dictionary the catalogs are loaded into. 发布后的插件只加载当前语言的翻译目录 旧模板的插件直接注册common_dictionary
+# 因此翻译目录始终加载到common_dictionary中
+if has_compiled_catalogs() and not (Path(__file__).parent / "dictionary.py").is_file():
+    common_dictionary = {}
+else:
+    from .dictionary import common_dictionary
 
 __dictionary__ = common_dictionary
 
@@ -24,30 +71,121 @@ __dictionary__ = common_dictionary
 def set_dictionary(new_dictionary: dict[str, dict[tuple, str]]):
     global __dictionary__
     __dictionary__ = new_dictionary
+    _loaded_catalogs.clear()
+    build_index()
+    subscribe_language_change()
 
 
 # Load additional dictionary for translation
 def load_dictionary(additional_dictionary: dict[str, dict[tuple, str]]):
     global __dictionary__
-    for key in additional_dictionary:
-        if key in __dictionary__:
-            __dictionary__[key].update(additional_dictionary[key])
-        else:
-            __dictionary__[key] = {}
-            __dictionary__[key].update(additional_dictionary[key])
+    with measure("i18n", "load_dictionary"):
+        for key in additional_dictionary:
+            if key in __dictionary__:
+                __dictionary__[key].update(additional_dictionary[key])
+            else:
+                __dictionary__[key] = {}
+                __dictionary__[key].update(additional_dictionary[key])
+        build_index()
+        subscribe_language_change()
+
+
+# Load the compiled catalog of a language into __dictionary__, return True if it was not loaded before.
+# Translations already in __dictionary__ are kept, e.g. the ones added by load_dictionary.
+def load_catalog(language_code: str) -> bool:
+    catalog_file = (__catalogs__ or {}).get(language_code)
+    if catalog_file is None or catalog_file in _loaded_catalogs:
+        return False
+    _loaded_catalogs.add(catalog_file)
+    with measure("i18n", f"load_catalog {catalog_file}"):
+        try:
+            entries = json.loads((_CATALOG_FOLDER / catalog_file).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Failed to load translation catalog {catalog_file}:", e)
+            return False
+        translations = __dictionary__.setdefault(language_code, {})
+        for context, msgid, translation in entries:
+            # Blender looks msgids up by their exact context, entries shared by "*" and "Operator" are expanded here
+            for key in ([("*", msgid), ("Operator", msgid)] if context == _ANY_CONTEXT else [(context, msgid)]):
+                translations.setdefault(key, translation)
+        for code, file in __catalogs__.items():
+            # languages sharing a catalog, e.g. zh_CN and zh_HANS
+            if file == catalog_file and code != language_code:
+                __dictionary__.setdefault(code, translations)
+    return True
+
+
+# Rebuild the index used by i18n, call it if __dictionary__ is modified without set_dictionary or load_dictionary
+def build_index():
+    global __index__
+    index = {}
+    # languages often share the same translations, e.g. zh_CN and zh_HANS
+    indexed_translations = {}
+    for language_code, translations in __dictionary__.items():
+        msgid_index = indexed_translations.get(id(translations))
+        if msgid_index is None:
+            msgid_index = {}
+            # a msgid is translated by its "*" context first, then "Operator", then the first other context
+            priorities = {}
+            for key, translation in translations.items():
+                if not isinstance(key, tuple):
+                    continue
+                priority = 0 if key[0] == "*" else 1 if key[0] == "Operator" else 2
+                if priorities.get(key[1], 3) > priority:
+                    priorities[key[1]] = priority
+                    msgid_index[key[1]] = translation
+            indexed_translations[id(translations)] = msgid_index
+        index[language_code] = msgid_index
+    __index__ = index
+    update_language()
+
+
+def update_language():
+    global __language_code__, __translations__
+    __language_code__ = bpy.context.preferences.view.language
+    if load_catalog(__language_code__):
+        build_index()
+        # Blender copies the translations when they are registered, register them again with the new language
+        if _registered_addon_name is not None:
+            bpy.app.translations.unregister(_registered_addon_name)
+            bpy.app.translations.register(_registered_addon_name, __dictionary__)
+        return
+    __translations__ = __index__.get(__language_code__, {})
+
+
+# Register the translations with Blender, the catalog of the new language is loaded when the language is changed.
+# 向Blender注册翻译 切换语言时加载对应语言的翻译目录
+def register_translations(addon_name: str):
+    global _registered_addon_name
+    with measure("i18n", "register_translations"):
+        bpy.app.translations.register(addon_name, __dictionary__)
+    _registered_addon_name = addon_name
+    subscribe_language_change()
+
+
+def unregister_translations(addon_name: str):
+    global _registered_addon_name
+    bpy.app.translations.unregister(addon_name)
+    _registered_addon_name = None
+    unsubscribe_language_change()
+
+
+# The active language is cached and updated through the message bus, it is notified when the language is changed in the
+# preferences UI or by python. 缓存当前语言 语言改变时通过消息总线更新
+def subscribe_language_change():
+    unsubscribe_language_change()
+    bpy.msgbus.subscribe_rna(key=(bpy.types.PreferencesView, "language"), owner=_language_subscription_owner,
+                             args=(), notify=update_language, options={"PERSISTENT"})
+
+
+def unsubscribe_language_change():
+    bpy.msgbus.clear_by_owner(_language_subscription_owner)
 
 
 # 在需要拼接字符串的地方使用i18n函数
 def i18n(content: str) -> str:
-    global __language_code__, __dictionary__
-    __language_code__ = bpy.context.preferences.view.language
-    if __language_code__ not in __dictionary__:
-        return content
-    tuple_contents = [("*", content), ("Operator", content)]
-    for tuple_content in tuple_contents:
-        if tuple_content in __dictionary__[__language_code__]:
-            return __dictionary__[__language_code__][tuple_content]
-    for key in __dictionary__[__language_code__]:
-        if key[1] == content:
-            return __dictionary__[__language_code__][key]
-    return content
+    return __translations__.get(content, content)
+
+
+build_index()
+subscribe_language_change()
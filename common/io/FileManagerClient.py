@@ -1,17 +1,9 @@
+import fnmatch
 import hashlib
+import mmap
 import os
-from os import listdir
-
-
-def get_all_filename(folder_path: str) -> list:
-    if os.path.exists(folder_path):
-        return [f for f in listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))]
-    else:
-        return []
-
-
-def get_all_subfolder(folder_path: str) -> list:
-    return [f for f in listdir(folder_path) if os.path.isdir(os.path.join(folder_path, f))]
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 # return true if path_a is a subdirectory under path_b
@@ -21,40 +13,196 @@ def is_subdirectory(path_a, path_b) -> bool:
     return os.path.commonpath([path_b]) == os.path.commonpath([path_a, path_b])
 
 
-def is_filename_postfix_in(filename: str, target_set: set):
-    if target_set is None or len(target_set) == 0:
-        return True
-    for postfix in target_set:
-        if filename.lower().endswith(postfix.lower()):
-            return True
-    return False
+class ExcludeRules:
+    """
+    .gitignore style exclude rules used when scanning a folder, e.g. [".git/", "__pycache__/", "*.blend1", "/build/"].
+    - A pattern ending with "/" only matches folders.
+    - A pattern containing "/" (other than a trailing one) is matched against the path relative to the scanned folder,
+      otherwise it is matched against the file or folder name at any depth. Wildcards follow fnmatch.
+    - A pattern starting with "!" includes again what a previous pattern excluded, the last matching pattern wins.
+    - Empty lines and lines starting with "#" are ignored.
+    An excluded folder is not scanned at all. With skip_virtual_envs, folders containing a pyvenv.cfg are excluded too.
+    """
+
+    def __init__(self, patterns=(), skip_virtual_envs=False):
+        self.skip_virtual_envs = skip_virtual_envs
+        self.rules = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if len(pattern) == 0 or pattern.startswith("#"):
+                continue
+            negate = pattern.startswith("!")
+            if negate:
+                pattern = pattern[1:]
+            folder_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            anchored = "/" in pattern
+            self.rules.append((pattern.lstrip("/"), negate, folder_only, anchored))
+
+    @classmethod
+    def from_file(cls, ignore_file: str, skip_virtual_envs=False):
+        return cls(read_utf8_in_lines(ignore_file), skip_virtual_envs)
+
+    def is_excluded(self, relative_path: str, is_folder: bool) -> bool:
+        # relative_path is relative to the scanned folder and separated by "/"
+        excluded = False
+        name = relative_path.rsplit("/", 1)[-1]
+        for pattern, negate, folder_only, anchored in self.rules:
+            if folder_only and not is_folder:
+                continue
+            if fnmatch.fnmatchcase(relative_path if anchored else name, pattern):
+                excluded = not negate
+        return excluded
+
+    def is_excluded_folder(self, relative_path: str, folder_path: str) -> bool:
+        # folder_path is the folder on disk, it is checked for a pyvenv.cfg with skip_virtual_envs
+        return self.is_excluded(relative_path, True) or (
+                self.skip_virtual_envs and os.path.isfile(os.path.join(folder_path, "pyvenv.cfg")))
+
+
+# folders that are never part of a workspace's source, used by the framework when scanning the workspace
+DEFAULT_EXCLUDES = ExcludeRules([".git/", "__pycache__/", ".venv/", "venv/"], skip_virtual_envs=True)
+
+
+def iter_files(folder_path: str, post_filter: set = None, excludes: ExcludeRules = None):
+    """
+    Yield the path of every file under folder_path, depth first, the files of a folder before its sub folders.
+    post_filter is a set of file name suffixes (case insensitive), empty or None for all files.
+    Folders are read with os.scandir, so the type of each entry is known without an extra stat call on most systems.
+    """
+    suffixes = tuple(postfix.lower() for postfix in post_filter) if post_filter else None
+    folders = [(folder_path, "")]
+    while folders:
+        current_folder, relative_folder = folders.pop()
+        try:
+            with os.scandir(current_folder) as entries:
+                entries = list(entries)
+        except FileNotFoundError:
+            # a sub folder removed while scanning
+            if current_folder == folder_path:
+                raise
+            continue
+        sub_folders = []
+        for entry in entries:
+            relative_path = relative_folder + entry.name
+            if entry.is_dir():
+                if excludes is not None and excludes.is_excluded_folder(relative_path, entry.path):
+                    continue
+                sub_folders.append((entry.path, relative_path + "/"))
+            elif entry.is_file():
+                if suffixes is not None and not entry.name.lower().endswith(suffixes):
+                    continue
+                if excludes is not None and excludes.is_excluded(relative_path, False):
+                    continue
+                yield entry.path
+        folders.extend(reversed(sub_folders))
+
+
+# 搜索文件夹下所有文件 post_filter为后缀名集合 不区分大小写 excludes为需要跳过的文件和文件夹
+def search_files(folder_path: str, post_filter: set, excludes: ExcludeRules = None) -> list:
+    return list(iter_files(folder_path, post_filter, excludes))
+
+
+class FileScanner:
+    """
+    Memoize the files found under folders, so that a folder is walked only once during a run (e.g. a release) even if
+    it is searched by several phases with different suffix filters.
+    Use a new scanner for each run, files added or removed after a folder has been walked are not seen by the scanner
+    unless the folder is invalidated.
+    """
+
+    def __init__(self, excludes: ExcludeRules = DEFAULT_EXCLUDES):
+        self.excludes = excludes
+        self._walks = {}
+
+    def search_files(self, folder_path: str, post_filter: set = None) -> list:
+        key = os.path.abspath(folder_path)
+        all_files = self._walks.get(key)
+        if all_files is None:
+            all_files = list(iter_files(folder_path, excludes=self.excludes))
+            self._walks[key] = all_files
+        if not post_filter:
+            return list(all_files)
+        suffixes = tuple(postfix.lower() for postfix in post_filter)
+        return [file for file in all_files if file.lower().endswith(suffixes)]
+
+    def invalidate(self, path: str):
+        # forget the walks of the folders containing path, e.g. after a file was added to or removed from it
+        # may be called from a file watcher thread while the scanner is used
+        for folder in [folder for folder in list(self._walks) if is_subdirectory(path, folder)]:
+            self._walks.pop(folder, None)
+
+    def walked_folders(self) -> list:
+        return list(self._walks)
+
+
+# files are hashed in chunks of this size, files larger than _MMAP_THRESHOLD are hashed through mmap
+_HASH_CHUNK_SIZE = 1024 * 1024
+_MMAP_THRESHOLD = 64 * 1024 * 1024
+# a file modified this recently might be modified again without changing its mtime (on file systems with coarse
+# timestamps), its digest is not cached
+_RACY_MTIME_NS = 2 * 1000 * 1000 * 1000
 
 
-# 搜索文件夹下所有文件 post_filter为后缀名集合 全小写
-def search_files(folder_path: str, post_filter: set) -> list:
-    def __depth_first_search_files_helper__(current_folder: str, pre_result: list):
-        for filename in get_all_filename(current_folder):
-            if is_filename_postfix_in(filename, post_filter):
-                pre_result.append(os.path.join(current_folder, filename))
-        all_folders = get_all_subfolder(current_folder)
-        for folder in all_folders:
-            __depth_first_search_files_helper__(os.path.join(current_folder, folder), pre_result)
+def get_md5(filename):
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= _MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                md5.update(mapped)
+        else:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                md5.update(chunk)
+    return md5.hexdigest()
 
-    all_file = []
-    __depth_first_search_files_helper__(folder_path, all_file)
-    return all_file
 
+def get_md5_folder(folder_path: str) -> str:
+    return fingerprint_folder(folder_path)[0]
 
-def get_md5(filename):
-    return hashlib.md5(open(filename, 'rb').read()).hexdigest()
 
+def fingerprint_folder(folder_path: str, cache: dict = None, workers: int = 1) -> tuple[str, dict[str, str]]:
+    """
+    Compute the md5 of every file in a folder and an aggregate digest of the folder.
+    The aggregate digest changes when any file is added, removed, renamed or modified.
 
-def get_md5_folder(folder_path: str) -> str:
+    Args:
+        folder_path: The folder to fingerprint.
+        cache: Optional dict kept by the caller across calls, the digest of a file whose size and mtime are unchanged
+               since the last call is reused instead of reading the file again.
+        workers: Number of threads used to hash files.
+
+    Returns:
+        tuple: (aggregate digest, {relative path with "/" separator: md5 of the file})
+    """
     all_files = search_files(folder_path, set())
-    md5_content = ""
+    cached_digests = {}
+    files_to_hash = []
+    for file in all_files:
+        file_stat = os.stat(file)
+        cached = cache.get(file) if cache is not None else None
+        if cached is not None and cached[0] == file_stat.st_size and cached[1] == file_stat.st_mtime_ns:
+            cached_digests[file] = cached[2]
+        else:
+            files_to_hash.append((file, file_stat))
+
+    hash_start_ns = time.time_ns()
+    if workers > 1 and len(files_to_hash) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = list(executor.map(get_md5, [file for file, _ in files_to_hash]))
+    else:
+        digests = [get_md5(file) for file, _ in files_to_hash]
+    for (file, file_stat), digest in zip(files_to_hash, digests):
+        cached_digests[file] = digest
+        if cache is not None and hash_start_ns - file_stat.st_mtime_ns > _RACY_MTIME_NS:
+            cache[file] = (file_stat.st_size, file_stat.st_mtime_ns, digest)
+
+    manifest = {}
     for file in all_files:
-        md5_content += get_md5(file)
-    return hashlib.md5(md5_content.encode("utf-8")).hexdigest()
+        manifest[os.path.relpath(file, folder_path).replace(os.sep, "/")] = cached_digests[file]
+    aggregate = hashlib.md5()
+    for relative_path in sorted(manifest):
+        aggregate.update(f"{relative_path}:{manifest[relative_path]}\n".encode("utf-8"))
+    return aggregate.hexdigest(), manifest
 
 
 def read_utf8(filepath: str) -> str:
@@ -0,0 +1,60 @@
+# Client of the build daemon (see BuildDaemon in framework.py), it only uses the standard library so that the command
+# line tools can talk to the daemon without importing the framework.
+# 构建守护进程的客户端 只依赖标准库 命令行工具无需导入框架即可向守护进程发送请求
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+class DaemonUnavailable(Exception):
+    # no daemon is serving the workspace, the request should be handled locally
+    pass
+
+
+class DaemonError(Exception):
+    # the daemon failed to handle the request
+    pass
+
+
+def daemon_socket_path(project_root: str) -> str:
+    # one daemon per workspace, unix socket paths are limited to about 100 characters so they are kept short
+    digest = hashlib.md5(os.path.abspath(project_root).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"blender_addon_daemon_{digest}.sock")
+
+
+def request_daemon(project_root: str, command: str, output=None, **arguments):
+    """
+    Send a request to the daemon serving project_root and return its result, the output printed by the daemon while
+    handling the request is written to output (default: sys.stdout).
+    Raises DaemonUnavailable if no daemon serves the workspace, DaemonError if the request failed.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise DaemonUnavailable("Unix sockets are not supported on this platform")
+    socket_path = daemon_socket_path(project_root)
+    if not os.path.exists(socket_path):
+        raise DaemonUnavailable("No daemon is running")
+    output = output or sys.stdout
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError as e:
+        connection.close()
+        raise DaemonUnavailable(f"Could not connect to the daemon: {e}")
+    with connection, connection.makefile("rw", encoding="utf-8") as stream:
+        stream.write(json.dumps({"command": command, "arguments": arguments}) + "\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "output" in message:
+                output.write(message["output"])
+                output.flush()
+            elif "unavailable" in message:
+                raise DaemonUnavailable(message["unavailable"])
+            elif "error" in message:
+                raise DaemonError(message["error"])
+            else:
+                return message.get("result")
+    raise DaemonUnavailable("The daemon closed the connection")
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import time
+
+from common.io.daemon_client import request_daemon, daemon_socket_path, DaemonUnavailable, DaemonError
+
+# Optional build daemon, it keeps the analysis of the workspace in memory so that release.py does not analyze the
+# workspace again on every run. release.py sends its requests to the daemon when it is running.
+# test.py --background runs the tests in the warm Blender workers of the daemon instead of starting Blender every time.
+# 可选的构建守护进程 在内存中保留工作空间的分析结果 运行时release.py会将请求发送给它
+# test.py --background 会在守护进程常驻的Blender工作进程中运行测试
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    start_parser = subparsers.add_parser("start", help='Start the daemon of this workspace.')
+    start_parser.add_argument('--detach', default=False, action='store_true', help='Run the daemon in the background, '
+                                                                                   'its output is written to a log '
+                                                                                   'file next to its socket.')
+    start_parser.add_argument('--blender_workers', default=None, type=int, help='Maximum number of headless Blender '
+                                                                               'workers running tests at once. '
+                                                                               'Default is the number of cpus.')
+    start_parser.add_argument('--warm', default=0, type=int, help='Number of Blender workers started with the '
+                                                                  'daemon, the others are started by the first test '
+                                                                  'runs.')
+    start_parser.add_argument('--recycle_after', default=None, type=int, help='Replace a Blender worker after this '
+                                                                              'many test runs. Default is 20.')
+    start_parser.add_argument('--max_memory_growth', default=None, type=int, help='Replace a Blender worker when its '
+                                                                                  'memory grew by more than this many '
+                                                                                  'MB since its first test run. '
+                                                                                  'Default is 1024.')
+    subparsers.add_parser("stop", help='Stop the daemon of this workspace.')
+    subparsers.add_parser("status", help='Show whether the daemon of this workspace is running.')
+    stage_parser = subparsers.add_parser("stage", help='Update the addon installed in Blender for test, the same as '
+                                                       'the update done by test.py when a file changes.')
+    stage_parser.add_argument('addon', default=None, nargs='?', help='addon name, default is ACTIVE_ADDON')
+    args = parser.parse_args()
+
+    if args.command == "start" and args.detach:
+        log_file = os.path.splitext(daemon_socket_path(PROJECT_ROOT))[0] + ".log"
+        with open(log_file, "w", encoding="utf-8") as log:
+            subprocess.Popen([sys.executable, os.path.abspath(__file__)] + [arg for arg in sys.argv[1:]
+                                                                            if arg != "--detach"],
+                             cwd=PROJECT_ROOT, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                             start_new_session=True)
+        # wait for the daemon to accept requests
+        for _ in range(100):
+            try:
+                status = request_daemon(PROJECT_ROOT, "status")
+                print(f"Build daemon started (pid {status['pid']}), log: {log_file}")
+                break
+            except DaemonUnavailable:
+                time.sleep(0.1)
+        else:
+            sys.exit(f"The build daemon did not start, see {log_file}")
+    elif args.command == "start":
+        from framework import BuildDaemon, BlenderWorkerPool, DEFAULT_WORKER_MAX_JOBS, \
+            DEFAULT_WORKER_MAX_MEMORY_GROWTH
+
+        worker_pool = BlenderWorkerPool(args.blender_workers, max_jobs=args.recycle_after or DEFAULT_WORKER_MAX_JOBS,
+                                        max_memory_growth=args.max_memory_growth * 1024 * 1024
+                                        if args.max_memory_growth else DEFAULT_WORKER_MAX_MEMORY_GROWTH)
+        BuildDaemon(worker_pool=worker_pool, warm_workers=args.warm).serve_forever()
+    else:
+        try:
+            result = request_daemon(PROJECT_ROOT, args.command,
+                                    **({"addon": args.addon} if args.command == "stage" else {}))
+        except DaemonUnavailable as e:
+            sys.exit(f"Build daemon is not running: {e}")
+        except DaemonError as e:
+            sys.exit(str(e))
+        if args.command == "status":
+            workers = result["blender_workers"]
+            print(f"Build daemon running (pid {result['pid']}), {result['requests']} requests served in "
+                  f"{result['uptime']:.0f} s, Blender workers: {workers['running']} running ({workers['idle']} idle) "
+                  f"of {workers['size']}, {workers['recycled']} recycled")
+        elif args.command == "stop":
+            print("Build daemon stopping")
@@ -1,19 +1,38 @@
 import ast
+import asyncio
 import atexit
+import contextlib
+import hashlib
+import json
 import os
 import re
+import runpy
 import shutil
-import subprocess
+import socket
+import socketserver
 import sys
+import tempfile
 import threading
 import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from xml.etree import ElementTree
 
 from common.class_loader.module_installer import install_if_missing, install_fake_bpy
-from common.io.FileManagerClient import search_files, read_utf8, write_utf8, is_subdirectory, get_md5_folder, \
-    read_utf8_in_lines, write_utf8_in_lines
-from main import PROJECT_ROOT, BLENDER_ADDON_PATH, BLENDER_EXE_PATH, DEFAULT_RELEASE_DIR, TEST_RELEASE_DIR, IS_EXTENSION
+from common.class_loader.blender_supervisor import BlenderRun, BlenderSupervisor, run_blender
+from common.class_loader.import_rewriter import ImportRewriter
+from common.class_loader.startup_profile import PROFILE_ENV, print_startup_profile
+from common.class_loader.registration_manifest import REGISTRATION_MANIFEST_FILE, build_registration_manifest
+from common.class_loader.translation_catalog import compile_translation_catalogs, merge_dictionaries
+from common.class_loader.module_scanner import ModuleIndex, parse_absolute_imports, parse_imported_modules, \
+    parse_imported_modules_in_file
+from common.io.daemon_client import daemon_socket_path, request_daemon, DaemonUnavailable
+from common.io.FileManagerClient import search_files, read_utf8, write_utf8, is_subdirectory, FileScanner, \
+    DEFAULT_EXCLUDES, fingerprint_folder, get_md5
+from main import PROJECT_ROOT, BLENDER_ADDON_PATH, BLENDER_EXE_PATH, DEFAULT_RELEASE_DIR, TEST_RELEASE_DIR, \
+    IS_EXTENSION, ACTIVE_ADDON
 
 try:
     # added in python3.11
@@ -26,10 +45,10 @@ except ImportError:
 # Following variables are used internally in the framework according to some protocols defined by Blender or
 # the framework itself. Do not change them unless you know what you are doing.
 _addon_namespace_pattern = re.compile("^[a-zA-Z]+[a-zA-Z0-9_]*$")
-_import_module_pattern = re.compile("from ([a-zA-Z_][a-zA-Z0-9_.]*) import (.+)")
-_relative_import_pattern = re.compile(r'^\s*(from\s+(\.+))(.*)$')
-_absolute_import_pattern = re.compile(r'^\s*from\s+(\w+[\w.]*)\s+import\s+(.*)$')
 _addon_md5__signature = "addon.txt"
+_addon_reload_manifest = "addon_manifest.json"
+# seconds without file changes to wait for before updating the addon for test
+DEFAULT_WATCH_DEBOUNCE = 0.2
 _ADDON_MANIFEST_FILE = "blender_manifest.toml"
 _WHEELS_PATH = "wheels"
 # 默认使用的插件模板 不要轻易修改
@@ -51,17 +70,17 @@ def new_addon(addon_name: str):
         raise ValueError("Invalid addon name: " + addon_name + " Please name it as a python package name")
     shutil.copytree(os.path.join(_ADDON_ROOT, _ADDON_TEMPLATE), new_addon_path)
 
-    all_template_file = search_files(new_addon_path, {".py", ".toml"})
+    all_template_file = search_files(new_addon_path, {".py", ".toml"}, DEFAULT_EXCLUDES)
     for py_file in all_template_file:
         content = read_utf8(py_file).replace(_ADDON_TEMPLATE, addon_name)
         write_utf8(py_file, content)
 
 
-def test_addon(addon_name, enable_watch=True):
+def test_addon(addon_name, enable_watch=True, debounce=DEFAULT_WATCH_DEBOUNCE, profile=False):
     init_file = get_init_file_path(addon_name)
     if not enable_watch:
         print('Do not auto reload addon when file changed')
-    start_test(init_file, addon_name, enable_watch=enable_watch)
+    start_test(init_file, addon_name, enable_watch=enable_watch, debounce=debounce, profile=profile)
 
 
 def get_init_file_path(addon_name):
@@ -74,53 +93,193 @@ def get_init_file_path(addon_name):
 
 # The following code will be injected into the blender python environment to enable hot reload
 # https://devtalk.blender.org/t/plugin-hot-reload-by-cleaning-sys-modules/20040
+# The host pushes a reload message through a local socket (see ReloadNotifier) as soon as the addon is updated, the
+# messages are received by a background thread and handled by a persistent timer in the main thread. If the socket is
+# not available, the timer falls back to polling the signature file every second.
+# 宿主进程在插件更新后通过本地socket推送重载消息，无法连接时退回到每秒轮询签名文件
 start_up_command = """
 import bpy
-from bpy.app.handlers import persistent
+import json
 import os
+import queue
+import socket
 import sys
+import threading
+import time
+
 existing_addon_md5 = ""
+if os.path.exists("{addon_signature}"):
+    with open("{addon_signature}", "r") as f:
+        existing_addon_md5 = f.read()
+
+def read_addon_manifest():
+    try:
+        with open("{addon_manifest}", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+loaded_manifest = read_addon_manifest()
+reload_requests = queue.Queue()
+update_channel_connected = threading.Event()
 try:
     bpy.ops.preferences.addon_enable(module="{addon_name}")
 except Exception as e:
     print("Addon enable failed:", e)
 
+def module_of(path):
+    parts = path[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(["{addon_name}"] + parts)
+
+def find_modules_to_purge(old_manifest, new_manifest):
+    # Changed modules, the modules importing them and their submodules. None means all modules of the addon
+    if old_manifest is None or new_manifest is None:
+        return None
+    old_files = old_manifest["files"]
+    new_files = new_manifest["files"]
+    changed_modules = [module_of(path) for path in set(old_files) | set(new_files)
+                       if path.endswith(".py") and old_files.get(path) != new_files.get(path)]
+    all_modules = set(old_manifest["imports"]) | set(new_manifest["imports"])
+    dependents = dict()
+    for manifest in (old_manifest, new_manifest):
+        for module, imported_modules in manifest["imports"].items():
+            for imported_module in imported_modules:
+                dependents.setdefault(imported_module, set()).add(module)
+    modules_to_purge = set()
+    while changed_modules:
+        module = changed_modules.pop()
+        if module in modules_to_purge:
+            continue
+        modules_to_purge.add(module)
+        changed_modules.extend(dependents.get(module, ()))
+        changed_modules.extend(m for m in all_modules if m.startswith(module + "."))
+    if "{addon_name}" in modules_to_purge:
+        return None
+    return modules_to_purge
+
+def reload_addon(addon_md5):
+    global existing_addon_md5, loaded_manifest
+    if addon_md5 == existing_addon_md5:
+        return
+    new_manifest = read_addon_manifest()
+    modules_to_purge = find_modules_to_purge(loaded_manifest, new_manifest)
+    print("Addon file changed, start to update the addon")
+    try:
+        bpy.ops.preferences.addon_disable(module="{addon_name}")
+        purged = 0
+        for k in sorted(sys.modules.keys()):
+            if k == "{addon_name}" or k.startswith("{addon_name}."):
+                if modules_to_purge is None or k in modules_to_purge:
+                    del sys.modules[k]
+                    purged += 1
+        print("Reloading", purged, "modules" if modules_to_purge is not None else "modules (full reload)")
+        bpy.ops.preferences.addon_enable(module="{addon_name}")
+    except Exception as e:
+        print("Addon update failed:", e)
+    existing_addon_md5 = addon_md5
+    loaded_manifest = new_manifest
+    print("Addon updated")
+
+def listen_for_update():
+    try:
+        connection = socket.create_connection(("127.0.0.1", {update_port}))
+    except OSError as e:
+        print("Could not connect to the update channel, polling for update instead:", e)
+        return
+    update_channel_connected.set()
+    try:
+        with connection, connection.makefile("r", encoding="utf-8") as stream:
+            for line in stream:
+                reload_requests.put(json.loads(line))
+    except (OSError, ValueError) as e:
+        print("Update channel closed:", e)
+    finally:
+        update_channel_connected.clear()
+
 def watch_update_tick():
-    global existing_addon_md5
+    latest_request = None
+    while not reload_requests.empty():
+        latest_request = reload_requests.get()
+    if latest_request is not None:
+        reload_addon(latest_request["md5"])
+    if update_channel_connected.is_set():
+        return 0.05
     if os.path.exists("{addon_signature}"):
         with open("{addon_signature}", "r") as f:
-            addon_md5 = f.read()
-        if existing_addon_md5 == "":
-            existing_addon_md5 = addon_md5
-        elif existing_addon_md5 != addon_md5:
-            print("Addon file changed, start to update the addon")
-            try:
-                bpy.ops.preferences.addon_disable(module="{addon_name}")
-                all_modules = sys.modules
-                all_modules = dict(sorted(all_modules.items(),key= lambda x:x[0])) #sort them
-                for k,v in all_modules.items():
-                    if k.startswith("{addon_name}"):
-                        del sys.modules[k]
-                bpy.ops.preferences.addon_enable(module="{addon_name}")
-            except Exception as e:
-                print("Addon update failed:", e)
-            existing_addon_md5 = addon_md5
-            print("Addon updated")
+            reload_addon(f.read())
     return 1.0
 
-@persistent
-def register_watch_update_tick(dummy):
-    print("Watching for addon update...")
-    bpy.app.timers.register(watch_update_tick)
-
-register_watch_update_tick(None)
-bpy.app.handlers.load_post.append(register_watch_update_tick)
+# Timers registered as persistent survive loading new files, so only one timer and one listener exist per session
+if {update_port} > 0:
+    threading.Thread(target=listen_for_update, daemon=True).start()
+print("Watching for addon update...")
+bpy.app.timers.register(watch_update_tick, persistent=True)
 """
 
 
-def start_test(init_file, addon_name, enable_watch=True):
+class ReloadNotifier:
+    """
+    Local socket server of the host side, the start_up_command running in Blender connects to it and receives a json
+    line for every update of the addon. Only the latest connection is kept, i.e. one Blender session per test.
+    """
+
+    def __init__(self):
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.port = self._server.getsockname()[1]
+        self._connection = None
+        self._latest_message = None
+        self._lock = threading.Lock()
+        threading.Thread(target=self._accept_connections, daemon=True).start()
+
+    def _accept_connections(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                # server closed
+                return
+            with self._lock:
+                if self._connection is not None:
+                    self._connection.close()
+                self._connection = connection
+                # the addon might be updated while Blender is starting up
+                if self._latest_message is not None:
+                    self._send(self._latest_message)
+
+    def notify(self, message: dict):
+        with self._lock:
+            self._latest_message = message
+            if self._connection is not None:
+                self._send(message)
+
+    def _send(self, message: dict):
+        try:
+            self._connection.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        except OSError:
+            self._connection.close()
+            self._connection = None
+
+    def close(self):
+        self._server.close()
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def start_test(init_file, addon_name, enable_watch=True, debounce=DEFAULT_WATCH_DEBOUNCE, profile=False):
     update_addon_for_test(init_file, addon_name)
     test_addon_path = os.path.normpath(os.path.join(BLENDER_ADDON_PATH, addon_name))
+    # the addon writes a startup profile every time it is enabled, the last one is printed when Blender exits
+    # 插件每次启用时都会写入启动耗时报告 Blender退出后打印最后一次的报告
+    profile_file = get_startup_profile_path(addon_name) if profile else None
+    env = None
+    if profile_file is not None:
+        if os.path.exists(profile_file):
+            os.remove(profile_file)
+        env = dict(os.environ, **{PROFILE_ENV: profile_file})
 
     if not enable_watch:
         def exit_handler():
@@ -131,19 +290,29 @@ def start_test(init_file, addon_name, enable_watch=True):
         try:
             execute_blender_script(
                 [BLENDER_EXE_PATH, "--python-use-system-env", "--python-expr",
-                 f"import bpy\nbpy.ops.preferences.addon_enable(module=\"{addon_name}\")"], test_addon_path)
+                 f"import bpy\nbpy.ops.preferences.addon_enable(module=\"{addon_name}\")"], test_addon_path, env)
         finally:
             exit_handler()
+            report_startup_profile(profile_file)
         return
 
+    try:
+        notifier = ReloadNotifier()
+    except OSError as e:
+        print("Could not start the update channel, Blender will poll for update instead:", e)
+        notifier = None
+
     # start_watch_for_update(init_file, addon_name)
     stop_event = threading.Event()
-    thread = threading.Thread(target=start_watch_for_update, args=(init_file, addon_name, stop_event))
+    thread = threading.Thread(target=start_watch_for_update,
+                              args=(init_file, addon_name, stop_event, notifier, debounce))
     thread.start()
 
     def exit_handler():
         stop_event.set()
         thread.join()
+        if notifier is not None:
+            notifier.close()
         if os.path.exists(test_addon_path):
             shutil.rmtree(test_addon_path)
 
@@ -151,32 +320,650 @@ def start_test(init_file, addon_name, enable_watch=True):
 
     python_script = start_up_command.format(addon_name=addon_name,
                                             addon_signature=os.path.join(test_addon_path,
-                                                                         _addon_md5__signature).replace("\\", "/"))
+                                                                         _addon_md5__signature).replace("\\", "/"),
+                                            addon_manifest=os.path.join(test_addon_path,
+                                                                        _addon_reload_manifest).replace("\\", "/"),
+                                            update_port=notifier.port if notifier is not None else 0)
 
     try:
         execute_blender_script([BLENDER_EXE_PATH, "--python-use-system-env", "--python-expr", python_script],
-                               test_addon_path)
+                               test_addon_path, env)
     finally:
         exit_handler()
+        report_startup_profile(profile_file)
+
+
+def get_startup_profile_path(addon_name):
+    return os.path.abspath(os.path.join(TEST_RELEASE_DIR, f"{addon_name}_startup_profile.json"))
+
+
+def report_startup_profile(profile_file):
+    if profile_file is None:
+        return
+    try:
+        with open(profile_file, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        print("No startup profile was written, make sure the register function of the addon uses startup_profile")
+        return
+    print_startup_profile(report)
+    print("Startup profile report:", profile_file)
+
+
+# Headless test runner 无界面的并行测试
+# Test modules are the files named test_*.py in the addon folder, they are only staged for test, never released, and
+# auto_load does not import them (keep in sync with auto_load._test_module_pattern). The runner imports them from the
+# addon enabled in Blender (so they can use relative imports), they may contain unittest.TestCase classes and test_*
+# functions.
+# The tests are sharded by module across several Blender processes started with --background, each of them has its own
+# user scripts and config folders so that they never write into the same addon folder.
+_TEST_MODULE_PATTERN = re.compile(r"^test_.*\.py$")
+_TEST_SHARD_ENV = "BLENDER_ADDON_TEST_SHARD"
+
+# Runs in Blender, the shard ({"addon", "modules", "report"}) is read from the environment
+background_test_command = """
+import bpy
+import importlib
+import inspect
+import json
+import os
+import time
+import traceback
+import unittest
+
+shard = json.loads(os.environ["BLENDER_ADDON_TEST_SHARD"])
+results = []
+finished_modules = []
+
+
+class ShardResult(unittest.TestResult):
+    def __init__(self, module_name):
+        super().__init__()
+        self.module_name = module_name
+        self.test_start = time.perf_counter()
+
+    def startTest(self, test):
+        super().startTest(test)
+        self.test_start = time.perf_counter()
+
+    def record(self, test, status, message=""):
+        # ids relative to the release folder, e.g. addons.sample_addon.test_operators.OperatorTest.test_execute
+        test_id = test.id()
+        if isinstance(test, unittest.FunctionTestCase):
+            test_id = self.module_name + "." + test_id
+        else:
+            test_id = test_id.replace(shard["addon"] + "." + self.module_name, self.module_name, 1)
+        results.append({"id": test_id, "module": self.module_name, "status": status, "message": message,
+                        "duration": time.perf_counter() - self.test_start})
+
+    def addSuccess(self, test):
+        self.record(test, "passed")
+
+    def addFailure(self, test, err):
+        self.record(test, "failed", self._exc_info_to_string(err, test))
+
+    def addError(self, test, err):
+        self.record(test, "error", self._exc_info_to_string(err, test))
+
+    def addSkip(self, test, reason):
+        self.record(test, "skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        self.record(test, "passed")
+
+    def addUnexpectedSuccess(self, test):
+        self.record(test, "failed", "unexpected success")
+
+
+def module_error(module_name, message):
+    results.append({"id": module_name, "module": module_name, "status": "error", "message": message, "duration": 0})
+
+
+def write_report():
+    # written after each module, the results of the finished modules are kept if Blender crashes or times out later
+    with open(shard["report"], "w", encoding="utf-8") as f:
+        json.dump({"modules": finished_modules, "tests": results}, f)
+
+
+try:
+    bpy.ops.preferences.addon_enable(module=shard["addon"])
+    enabled = True
+except Exception:
+    enabled = False
+    for module_name in shard["modules"]:
+        module_error(module_name, "Addon enable failed: " + traceback.format_exc())
+        finished_modules.append(module_name)
+
+for module_name in shard["modules"] if enabled else []:
+    try:
+        module = importlib.import_module(shard["addon"] + "." + module_name)
+        suite = unittest.defaultTestLoader.loadTestsFromModule(module)
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if name.startswith("test") and function.__module__ == module.__name__:
+                suite.addTest(unittest.FunctionTestCase(function))
+    except Exception:
+        module_error(module_name, "Import failed: " + traceback.format_exc())
+    else:
+        # errors outside of the tests, e.g. in setUpClass, are reported with the name of the failing fixture
+        suite.run(ShardResult(module_name))
+    finished_modules.append(module_name)
+    write_report()
+
+write_report()
+"""
+
+
+def _is_test_module(file_path) -> bool:
+    return _TEST_MODULE_PATTERN.match(os.path.basename(file_path)) is not None
+
+
+def discover_test_modules(addon_name) -> list:
+    # names of the test modules relative to the release folder, e.g. addons.sample_addon.tests.test_operators
+    addon_folder = os.path.join(_ADDON_ROOT, addon_name)
+    test_modules = []
+    for file_path in search_files(addon_folder, {".py"}, DEFAULT_EXCLUDES):
+        if not _is_test_module(file_path):
+            continue
+        relative_parts = os.path.relpath(file_path, PROJECT_ROOT)[:-len(".py")].split(os.sep)
+        # like auto_load, a module is importable only if all of its folders are packages
+        if all(os.path.isfile(os.path.join(PROJECT_ROOT, *relative_parts[:i], "__init__.py"))
+               for i in range(2, len(relative_parts))):
+            test_modules.append(".".join(relative_parts))
+    return sorted(test_modules)
+
+
+def run_background_tests(addon_name, shards=None, timeout=None, report_dir=TEST_RELEASE_DIR, verbose=False,
+                         worker_pool=None, **stage_options) -> bool:
+    """
+    Run the test modules of an addon in `shards` headless Blender processes at once (default: number of cpus), and
+    write the merged results into report_dir/<addon_name>_tests.json and a JUnit report
+    report_dir/<addon_name>_tests.xml.
+    The addon is staged once, then linked into the user scripts folder of every shard. A shard that crashes or times
+    out reports an error for each of its modules, with the end of its output.
+    When a worker_pool is given, the shards run in its warm Blender workers instead of new Blender processes.
+    stage_options are passed to stage_addon_for_test. Returns True if all tests passed.
+    """
+    start_time = time.perf_counter()
+    test_modules = discover_test_modules(addon_name)
+    if len(test_modules) == 0:
+        print(f"No test module (test_*.py) found in {addon_name}")
+        return True
+    default_shards = worker_pool.size if worker_pool is not None else os.cpu_count() or 1
+    shards = max(1, min(shards or default_shards, len(test_modules)))
+    staged_folder, _, _ = stage_addon_for_test(get_init_file_path(addon_name), addon_name, **stage_options)
+    # the modules are dealt to the shards in turn, so that the modules of a folder are spread over the shards
+    work_folder = tempfile.mkdtemp(prefix=f"{addon_name}_tests_")
+    shard_specs = [{"addon": addon_name, "modules": test_modules[i::shards],
+                    "report": os.path.join(work_folder, f"shard{i}.json")} for i in range(shards)]
+    try:
+        if worker_pool is None:
+            failures, path_remaps = _run_test_shards(staged_folder, work_folder, shard_specs, timeout, verbose)
+        else:
+            failures, path_remaps = worker_pool.run_test_shards(staged_folder, shard_specs, timeout, verbose)
+
+        line_remapper = BlenderSupervisor(path_remaps)
+        results = []
+        for i, (failure, shard) in enumerate(zip(failures, shard_specs)):
+            try:
+                with open(shard["report"], "r", encoding="utf-8") as f:
+                    shard_report = json.load(f)
+            except (OSError, ValueError):
+                shard_report = {"modules": [], "tests": []}
+            shard_results = shard_report["tests"]
+            reported_modules = set(shard_report["modules"])
+            if len(reported_modules) < len(shard["modules"]):
+                message = failure or "Blender did not report the results of the module"
+                shard_results.extend({"id": module_name, "module": module_name, "status": "error", "message": message,
+                                      "duration": 0}
+                                     for module_name in shard["modules"] if module_name not in reported_modules)
+            for result in shard_results:
+                result["shard"] = i
+                result["message"] = "".join(line_remapper.remap_line(line)
+                                            for line in result["message"].splitlines(True))
+            results.extend(shard_results)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    duration = time.perf_counter() - start_time
+    summary = {status: sum(1 for result in results if result["status"] == status)
+               for status in ("passed", "failed", "error", "skipped")}
+    os.makedirs(report_dir, exist_ok=True)
+    json_report = os.path.join(report_dir, f"{addon_name}_tests.json")
+    write_utf8(json_report, json.dumps({"addon": addon_name, "shards": shards, "duration": duration,
+                                        "summary": summary, "tests": results}, indent=1))
+    junit_report = os.path.join(report_dir, f"{addon_name}_tests.xml")
+    write_junit_report(junit_report, addon_name, results)
+
+    for result in results:
+        if result["status"] in ("failed", "error"):
+            print(f"{result['status'].upper()}: {result['id']}\n{result['message']}")
+    print(f"{len(results)} tests in {shards} Blender {'workers' if worker_pool is not None else 'processes'}, "
+          f"{duration:.2f} s: " + ", ".join(f"{count} {status}" for status, count in summary.items()))
+    print("Test reports:", json_report, junit_report)
+    return summary["failed"] == 0 and summary["error"] == 0
+
+
+def _run_test_shards(staged_folder, work_folder, shard_specs: list, timeout, verbose):
+    # run every shard in a new Blender process with its own user scripts and config folders
+    # returns (the reason each shard failed or None, path remaps of the tracebacks)
+    addon_name = shard_specs[0]["addon"]
+    jobs = []
+    path_remaps = {}
+    for i, shard in enumerate(shard_specs):
+        shard_folder = os.path.join(work_folder, f"shard{i}")
+        shard_addon_folder = os.path.join(shard_folder, "scripts", "addons", addon_name)
+        shutil.copytree(staged_folder, shard_addon_folder, copy_function=_link_or_copy)
+        path_remaps[shard_addon_folder] = PROJECT_ROOT
+        env = dict(os.environ, BLENDER_USER_SCRIPTS=os.path.join(shard_folder, "scripts"),
+                   BLENDER_USER_CONFIG=os.path.join(shard_folder, "config"),
+                   **{_TEST_SHARD_ENV: json.dumps(shard)})
+        jobs.append({"args": [BLENDER_EXE_PATH, "--background", "--factory-startup", "--python-use-system-env",
+                              "--python-expr", background_test_command],
+                     "name": f"shard{i}", "timeout": timeout, "env": env})
+    runs = asyncio.run(BlenderSupervisor(path_remaps, echo=verbose).run_all(jobs))
+    failures = []
+    for run in runs:
+        reason = "timed out" if run.timed_out else f"exited with code {run.returncode}"
+        failures.append(f"Blender {reason} before reporting:\n" + "".join(run.tail(50)))
+    return failures, path_remaps
+
+
+def write_junit_report(report_file, addon_name, results: list):
+    # one testsuite per test module, see https://github.com/testmoapp/junitxml
+    suites = ElementTree.Element("testsuites", name=addon_name, tests=str(len(results)),
+                                 time=f"{sum(result['duration'] for result in results):.3f}")
+    for module_name in sorted({result["module"] for result in results}):
+        module_results = [result for result in results if result["module"] == module_name]
+        suite = ElementTree.SubElement(suites, "testsuite", name=module_name, tests=str(len(module_results)),
+                                       failures=str(sum(result["status"] == "failed" for result in module_results)),
+                                       errors=str(sum(result["status"] == "error" for result in module_results)),
+                                       skipped=str(sum(result["status"] == "skipped" for result in module_results)),
+                                       time=f"{sum(result['duration'] for result in module_results):.3f}")
+        for result in module_results:
+            class_name, test_name = module_name, result["id"]
+            if result["id"].startswith(module_name + "."):
+                class_name, _, test_name = result["id"].rpartition(".")
+            case = ElementTree.SubElement(suite, "testcase", classname=class_name, name=test_name,
+                                          time=f"{result['duration']:.3f}")
+            if result["status"] in ("failed", "error", "skipped"):
+                tag = {"failed": "failure", "error": "error", "skipped": "skipped"}[result["status"]]
+                element = ElementTree.SubElement(case, tag, message=result["message"].strip().split("\n")[-1][:200])
+                element.text = result["message"]
+    ElementTree.ElementTree(suites).write(report_file, encoding="utf-8", xml_declaration=True)
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        # hard links are not supported by the file system
+        shutil.copy2(source, target)
+
+
+# Blender worker pool 常驻的Blender工作进程池
+# Starting Blender and enabling the addon takes most of the time of a test run. The build daemon keeps a pool of
+# headless Blender processes running between test runs: like start_up_command, blender_worker_command is injected with
+# --python-expr and connects back to a local socket of the host, then executes the commands it receives one at a time.
+# A worker is replaced after a number of jobs or when its memory grew too much, since the state left by the tests is
+# never fully cleaned up.
+DEFAULT_WORKER_MAX_JOBS = 20
+DEFAULT_WORKER_MAX_MEMORY_GROWTH = 1024 * 1024 * 1024
+_WORKER_STARTUP_TIMEOUT = 120
+
+# Commands: enable (addon), run (code executed with the given environment variables), reset (disable the addon, forget
+# its modules and load the factory settings) and quit. Every reply is a json line with the memory used by Blender.
+blender_worker_command = """
+import bpy
+import json
+import os
+import socket
+import sys
+import traceback
+
+
+def memory_usage():
+    # resident memory in bytes, the peak of it where /proc is not available, None on Windows
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def purge_modules(addon_name):
+    for name in list(sys.modules):
+        if name == addon_name or name.startswith(addon_name + "."):
+            del sys.modules[name]
+
+
+def handle(command, arguments):
+    if command == "enable":
+        purge_modules(arguments["addon"])
+        bpy.ops.preferences.addon_enable(module=arguments["addon"])
+    elif command == "run":
+        environment = dict(os.environ)
+        os.environ.update(arguments.get("env", {{}}))
+        try:
+            exec(compile(arguments["code"], "<worker job>", "exec"), {{"__name__": "__main__"}})
+        finally:
+            os.environ.clear()
+            os.environ.update(environment)
+    elif command == "reset":
+        if arguments.get("addon"):
+            try:
+                bpy.ops.preferences.addon_disable(module=arguments["addon"])
+            except Exception:
+                traceback.print_exc()
+            purge_modules(arguments["addon"])
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+    else:
+        raise ValueError("Unknown worker command: " + command)
+
+
+connection = socket.create_connection(("127.0.0.1", {worker_port}))
+with connection, connection.makefile("rw", encoding="utf-8") as stream:
+    def reply(message):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        message["memory"] = memory_usage()
+        stream.write(json.dumps(message) + "\\n")
+        stream.flush()
+
+    reply({{"ready": True}})
+    for line in stream:
+        request = json.loads(line)
+        if request["command"] == "quit":
+            break
+        try:
+            handle(request["command"], request.get("arguments", {{}}))
+            reply({{"ok": True}})
+        except (Exception, SystemExit):
+            reply({{"error": traceback.format_exc()}})
+"""
+
+
+class BlenderWorkerError(Exception):
+    # a command failed in a worker, or the worker was lost (timed_out is True if it was stopped after a timeout)
+    def __init__(self, message, timed_out=False):
+        super().__init__(message)
+        self.timed_out = timed_out
+
+
+class BlenderWorker:
+    """
+    A headless Blender process running blender_worker_command, with its own user scripts and config folders.
+    The process is run by a BlenderSupervisor in an event loop of its own thread, it drains the output into the log of
+    the worker and remaps the paths of the addon in tracebacks. Stopping the worker cancels the supervisor, which
+    terminates then kills Blender. The jobs are timed out by the worker itself, since the process keeps running
+    between them.
+    """
+
+    def __init__(self, folder, startup_timeout=_WORKER_STARTUP_TIMEOUT, log_lines=2000):
+        self.folder = folder
+        self.addons_folder = os.path.join(folder, "scripts", "addons")
+        self.jobs = 0
+        # memory used after the first job, growth is measured from there since the addon is loaded by then
+        self.baseline_memory = None
+        self.memory = None
+        self._connection = None
+        self._stream = None
+        os.makedirs(self.addons_folder, exist_ok=True)
+        server = socket.create_server(("127.0.0.1", 0))
+        server.settimeout(0.5)
+        env = dict(os.environ, BLENDER_USER_SCRIPTS=os.path.join(folder, "scripts"),
+                   BLENDER_USER_CONFIG=os.path.join(folder, "config"))
+        args = [BLENDER_EXE_PATH, "--background", "--factory-startup", "--python-use-system-env", "--python-expr",
+                blender_worker_command.format(worker_port=server.getsockname()[1])]
+        # the paths of the staged addons are added by stage
+        self.supervisor = BlenderSupervisor(log_lines=log_lines, echo=False)
+        self.run = BlenderRun(os.path.basename(folder), args, log_lines)
+        self._task = None
+        self._loop = None
+        task_started = threading.Event()
+
+        async def supervise():
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.current_task()
+            task_started.set()
+            try:
+                await self.supervisor.run(args, env=env, blender_run=self.run)
+            except asyncio.CancelledError:
+                # stopped by kill, Blender is stopped by the supervisor before the task ends
+                pass
+            except OSError as e:
+                self.run.log.append(("stderr", f"Could not start Blender: {e}\n"))
+                self.run.returncode = -1
+
+        self._thread = threading.Thread(target=asyncio.run, args=(supervise(),), daemon=True)
+        self._thread.start()
+        task_started.wait()
+        try:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                try:
+                    self._connection, _ = server.accept()
+                    break
+                except socket.timeout:
+                    if not self.alive or time.monotonic() > deadline:
+                        self.kill()
+                        raise BlenderWorkerError("Blender worker did not start:\n" + "".join(self.run.tail(50)))
+        finally:
+            server.close()
+        self._stream = self._connection.makefile("rw", encoding="utf-8")
+        self.memory = self._receive(startup_timeout).get("memory")
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive() and self.run.returncode is None
+
+    def request(self, command: str, timeout: float = None, **arguments):
+        try:
+            self._stream.write(json.dumps({"command": command, "arguments": arguments}) + "\n")
+            self._stream.flush()
+        except OSError as e:
+            self.kill()
+            raise BlenderWorkerError(f"Blender worker exited: {e}")
+        reply = self._receive(timeout)
+        self.memory = reply.get("memory")
+        if "error" in reply:
+            raise BlenderWorkerError("".join(self.supervisor.remap_line(line)
+                                             for line in reply["error"].splitlines(True)))
+
+    def _receive(self, timeout) -> dict:
+        self._connection.settimeout(timeout)
+        try:
+            line = self._stream.readline()
+        except socket.timeout:
+            self.kill()
+            raise BlenderWorkerError(f"Blender worker timed out after {timeout} s", timed_out=True)
+        except OSError:
+            line = ""
+        if not line:
+            self.kill()
+            raise BlenderWorkerError(f"Blender worker exited with code {self.run.returncode}")
+        return json.loads(line)
+
+    def stage(self, addon_name, staged_folder):
+        # the staged files are linked again for every job, they might have been replaced since the last one
+        addon_folder = os.path.join(self.addons_folder, addon_name)
+        if os.path.exists(addon_folder):
+            shutil.rmtree(addon_folder)
+        shutil.copytree(staged_folder, addon_folder, copy_function=_link_or_copy)
+        self.supervisor.path_remaps[addon_folder] = PROJECT_ROOT
+
+    def finish_job(self):
+        self.jobs += 1
+        if self.baseline_memory is None:
+            self.baseline_memory = self.memory
+
+    def should_recycle(self, max_jobs, max_memory_growth) -> bool:
+        if self.jobs >= max_jobs:
+            return True
+        return (self.memory is not None and self.baseline_memory is not None
+                and self.memory - self.baseline_memory > max_memory_growth)
+
+    def kill(self):
+        # cancelling the supervisor stops Blender, see BlenderSupervisor.run
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join()
+        self._close_connection()
+
+    def close(self):
+        if self.alive and self._stream is not None:
+            try:
+                self._stream.write(json.dumps({"command": "quit"}) + "\n")
+                self._stream.flush()
+                self._thread.join(10)
+            except OSError:
+                pass
+        self.kill()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def _close_connection(self):
+        for closeable in (self._stream, self._connection):
+            if closeable is not None:
+                try:
+                    closeable.close()
+                except OSError:
+                    pass
+
+
+class BlenderWorkerPool:
+    """
+    Warm headless Blender workers shared by the test runs of the build daemon, at most `size` of them run at once.
+    Workers are started on demand (or ahead of time by warm_up) and kept when they are released, a worker is replaced
+    after max_jobs jobs or when its memory grew by more than max_memory_growth bytes since its first job.
+    """
+
+    def __init__(self, size=None, max_jobs=DEFAULT_WORKER_MAX_JOBS,
+                 max_memory_growth=DEFAULT_WORKER_MAX_MEMORY_GROWTH):
+        self.size = size or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.max_memory_growth = max_memory_growth
+        self.started_workers = 0
+        self.recycled_workers = 0
+        self._folder = None
+        self._idle = []
+        # workers alive or starting, idle or not
+        self._count = 0
+        self._condition = threading.Condition()
+
+    def warm_up(self, count=None):
+        # start workers until count (default: size) of them are idle
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            workers = list(executor.map(lambda _: self._checkout(), range(min(count or self.size, self.size))))
+        for worker in workers:
+            self._checkin(worker)
+
+    @contextlib.contextmanager
+    def worker(self):
+        worker = self._checkout()
+        try:
+            yield worker
+        finally:
+            self._checkin(worker)
+
+    def _checkout(self) -> BlenderWorker:
+        with self._condition:
+            while len(self._idle) == 0 and self._count >= self.size:
+                self._condition.wait()
+            if len(self._idle) > 0:
+                return self._idle.pop()
+            self._count += 1
+            if self._folder is None:
+                self._folder = tempfile.mkdtemp(prefix="blender_workers_")
+            worker_folder = os.path.join(self._folder, f"worker{self.started_workers}")
+            self.started_workers += 1
+        try:
+            return BlenderWorker(worker_folder)
+        except BaseException:
+            with self._condition:
+                self._count -= 1
+                self._condition.notify()
+            raise
+
+    def _checkin(self, worker: BlenderWorker):
+        recycle = not worker.alive or worker.should_recycle(self.max_jobs, self.max_memory_growth)
+        if recycle:
+            worker.close()
+        with self._condition:
+            if recycle:
+                self._count -= 1
+                self.recycled_workers += 1
+            else:
+                self._idle.append(worker)
+            self._condition.notify()
+
+    def run_test_shards(self, staged_folder, shard_specs: list, timeout, verbose):
+        # the same as _run_test_shards with the workers of the pool, one job per shard
+        addon_name = shard_specs[0]["addon"]
+        path_remaps = {}
+        lock = threading.Lock()
+
+        def run_shard(i, shard):
+            try:
+                with self.worker() as worker:
+                    with lock:
+                        path_remaps[os.path.join(worker.addons_folder, addon_name)] = PROJECT_ROOT
+                    line_count = worker.run.line_count
+                    failure = None
+                    try:
+                        worker.stage(addon_name, staged_folder)
+                        worker.request("run", timeout, code=background_test_command,
+                                       env={_TEST_SHARD_ENV: json.dumps(shard)})
+                        worker.request("reset", _WORKER_STARTUP_TIMEOUT, addon=addon_name)
+                        worker.finish_job()
+                    except BlenderWorkerError as e:
+                        failure = str(e)
+                    output = "".join(worker.run.lines_since(line_count))
+            except BlenderWorkerError as e:
+                return str(e)
+            if verbose:
+                print("".join(f"[shard{i}] {line}" for line in output.splitlines(True)), end="")
+            if failure is not None:
+                return f"{failure}\n" + "".join(output.splitlines(True)[-50:])
+            return "Blender worker did not report all modules:\n" + "".join(output.splitlines(True)[-50:])
+
+        with ThreadPoolExecutor(max_workers=len(shard_specs)) as executor:
+            failures = list(executor.map(run_shard, range(len(shard_specs)), shard_specs))
+        return failures, path_remaps
+
+    def status(self) -> dict:
+        with self._condition:
+            return {"size": self.size, "running": self._count, "idle": len(self._idle),
+                    "started": self.started_workers, "recycled": self.recycled_workers}
+
+    def close(self):
+        with self._condition:
+            workers, self._idle = self._idle, []
+            self._count -= len(workers)
+        for worker in workers:
+            worker.close()
+        if self._folder is not None:
+            shutil.rmtree(self._folder, ignore_errors=True)
 
 
 # This is the only corner case need to handle
 _addon_on_init_file = os.path.abspath(os.path.join(PROJECT_ROOT, "__init__.py"))
 
 
-def execute_blender_script(args, addon_path):
-    process = subprocess.Popen(args, stderr=subprocess.PIPE, text=True, encoding="utf-8")
+def execute_blender_script(args, addon_path, env=None, timeout=None):
+    # Blender writes to the terminal directly so that its output shows up as soon as it is printed, stderr is drained
+    # to map the paths of the test addon in tracebacks back to the workspace, see BlenderSupervisor.
+    # Returns the BlenderRun, or None if interrupted with Ctrl+C
     try:
-        for line in process.stderr:
-            line: str
-            if line.lstrip().startswith("File"):
-                line = line.replace(addon_path, PROJECT_ROOT)
-            sys.stderr.write(line)
+        return run_blender(args, {addon_path: PROJECT_ROOT}, timeout=timeout, env=env, inherit_stdout=True)
     except KeyboardInterrupt:
+        # the process is terminated when the supervisor is cancelled
         sys.stderr.write("interrupted, terminating the child process...\n")
-    finally:
-        process.terminate()
-        process.wait()
+        return None
 
 
 def read_ext_config(addon_config_file):
@@ -193,23 +980,11 @@ def release_addon(target_init_file, addon_name,
                   need_zip=True,
                   is_extension=IS_EXTENSION,
                   with_timestamp=False,
-                  with_version=False):
-    # if release dir is under PROJECT_ROOT, it's not allowed
-    if is_subdirectory(release_dir, PROJECT_ROOT):
-        # 不要将插件发布目录设置在当前项目内
-        raise ValueError("Invalid release dir:", release_dir,
-                         "Please set a release/test dir outside the current workspace")
-
-    if not bool(_addon_namespace_pattern.match(addon_name)):
-        raise ValueError("InValid addon_name:", addon_name, "Please name it as a python package name")
-
-    if is_extension:
-        # 发布为扩展时，请确保您在config.py正确的定义了__addon_name__
-        # Release as extension, please make sure you defined __addon_name__ correctly in config.py"
-        # Make sure toml file exists
-        addon_config_file = os.path.join(_ADDON_ROOT, addon_name, _ADDON_MANIFEST_FILE)
-        if not os.path.isfile(addon_config_file):
-            raise ValueError("Extension config file not found:", addon_config_file)
+                  with_version=False,
+                  scan_workers=None,
+                  release_files: dict = None):
+    # release_files is the result of collect_release_files, it is collected here if not provided
+    check_release_target(release_dir, addon_name, is_extension)
 
     if not os.path.isdir(release_dir):
         Path(release_dir).mkdir(parents=True, exist_ok=True)
@@ -218,56 +993,35 @@ def release_addon(target_init_file, addon_name,
     release_folder = os.path.join(release_dir, addon_name)
     if os.path.exists(release_folder):
         shutil.rmtree(release_folder)
-    os.mkdir(release_folder)
-
-    bootstrap_init_file = generate_bootstrap_init_file(addon_name, get_addon_info(target_init_file))
-    write_utf8(os.path.join(release_folder, "__init__.py"), bootstrap_init_file)
-
-    # shutil.copyfile(target_init_file, os.path.join(release_folder, "__init__.py"))
-    # 将target_init_file同级的其他非py文件复制到发布目录 如 toml xml等可能跟插件有关的配置文件
-    for file in os.listdir(os.path.dirname(target_init_file)):
-        file_path = os.path.join(os.path.dirname(target_init_file), file)
-        if os.path.isdir(file_path) or file.endswith(".py"):
-            continue
-        shutil.copy(file_path, release_folder)
-
-    # 将插件文件夹复制到发布目录
-    shutil.copytree(os.path.join(_ADDON_ROOT, addon_name), os.path.join(release_folder, _ADDONS_FOLDER, addon_name))
-    shutil.copyfile(os.path.join(_ADDON_ROOT, "__init__.py"),
-                    os.path.join(release_folder, _ADDONS_FOLDER, "__init__.py"))
 
-    all_py_files = search_files(os.path.join(_ADDON_ROOT, addon_name), {".py"})
-    # 对插件文件夹中的每一个py文件进行分析，找到每个py文件中依赖的其他py文件
-    visited_py_files = set()
-    for py_file in all_py_files:
-        visited_py_files.add(os.path.abspath(py_file))
-    # 注意不要漏掉__init__.py文件
-    visited_py_files.add(os.path.abspath(os.path.join(_ADDON_ROOT, "__init__.py")))
-
-    dependencies = find_all_dependencies(list(visited_py_files), PROJECT_ROOT)
-    for dependency in dependencies:
-        dependency = os.path.abspath(dependency)
-        if dependency in visited_py_files:
-            continue
-        visited_py_files.add(dependency)
-        target_path = os.path.join(release_folder, os.path.relpath(dependency, PROJECT_ROOT))
-        if not os.path.exists(os.path.dirname(target_path)):
-            os.makedirs(os.path.dirname(target_path))
-        shutil.copy(dependency, os.path.join(release_folder, os.path.relpath(dependency, PROJECT_ROOT)))
-
-    remove_pyc_files(release_folder)
-    removed_path = 1
-    while removed_path > 0:
-        removed_path = remove_empty_folders(release_folder)
-
-    # 必须先将绝对导入转换为相对导入，否则enhance_import_for_py_files一步会改变绝对导入的路径导致出错
-    # convert absolute import to relative import if it's an extension
-    if is_extension:
-        for py_file in search_files(release_folder, {".py"}):
-            convert_absolute_to_relative(py_file, release_folder)
-
-    # 更新打包后的绝对导入路径：由于打包后文件夹的层级关系发生了变化，需要更新打包后的绝对导入路径
-    enhance_import_for_py_files(release_folder)
+    # 将插件文件夹及其依赖的其他py文件复制到发布目录
+    # copy the addon folder and all the py files it depends on into the release folder
+    if release_files is None:
+        release_files = collect_release_files(target_init_file, addon_name, scan_workers)
+        print("Dependency analysis: {hits} files from cache, {misses} files parsed".format(**dependency_cache_stats))
+
+    # 更新打包后的导入路径：由于打包后文件夹的层级关系发生了变化，需要更新打包后的绝对导入路径 扩展则将绝对导入转换为相对导入
+    # update absolute imports since the folder structure changes after packaging, extensions use relative imports
+    import_rewriter = ImportRewriter(release_files.keys(), addon_name, is_extension)
+
+    # 将翻译字典编译为按语言划分的目录 插件启用时只加载当前语言
+    # compile the translation dictionaries into one catalog per language, only the active language is loaded in Blender
+    translation_catalogs, compiled_modules = compile_release_translations(addon_name, release_files)
+    py_sources = {relative_path.replace(os.sep, "/"): read_utf8(source_file)
+                  for relative_path, source_file in release_files.items() if relative_path.endswith(".py")}
+    # the compiled dictionaries are left out of the release unless a module still needs to import them
+    removed_modules = find_removable_compiled_modules(py_sources, compiled_modules)
+    if removed_modules:
+        release_files = {relative_path: source_file for relative_path, source_file in release_files.items()
+                         if _module_name_of(relative_path) not in removed_modules}
+        py_sources = {relative_path: source for relative_path, source in py_sources.items()
+                      if _module_name_of(relative_path) not in removed_modules}
+
+    # 预先计算类的注册顺序 加快插件的启用速度
+    # compute the registration order of the classes, auto_load uses it instead of discovering it when the addon is
+    # enabled
+    registration_manifest = build_registration_manifest(py_sources, compiled_modules)
+    generated_files = {REGISTRATION_MANIFEST_FILE: json.dumps(registration_manifest, indent=1), **translation_catalogs}
 
     # enhance relative import for root __init__.py
     # enhance_relative_import_for_init_py(os.path.join(release_folder, "__init__.py"),
@@ -280,20 +1034,16 @@ def release_addon(target_init_file, addon_name,
         addon_config = read_ext_config(addon_config_file)
     if need_zip:
         # package whl files into extension
-        if "wheels" in addon_config:
-            wheel_files = addon_config["wheels"]
-            if len(wheel_files) > 0:
-                wheel_folder = os.path.join(release_folder, _WHEELS_PATH)
-                os.mkdir(wheel_folder)
-                for wheel_file in wheel_files:
-                    # You much put the .whl file directly under the wheels folder, not in a subfolder
-                    # 你必须将.whl文件直接放在wheels文件夹下，而不是在子文件夹中
-                    assert wheel_file.startswith("./wheels/") and wheel_file.count("/") == 2
-                    wheel_source = os.path.join(PROJECT_ROOT, wheel_file)
-                    if not os.path.exists(wheel_source):
-                        raise ValueError("Wheel file not found:", wheel_source,
-                                         ". Please download the required wheel file to the wheels folder.")
-                    shutil.copy(wheel_source, wheel_folder)
+        release_files = dict(release_files)
+        for wheel_file in addon_config.get("wheels", []):
+            # You much put the .whl file directly under the wheels folder, not in a subfolder
+            # 你必须将.whl文件直接放在wheels文件夹下，而不是在子文件夹中
+            assert wheel_file.startswith("./wheels/") and wheel_file.count("/") == 2
+            wheel_source = os.path.join(PROJECT_ROOT, wheel_file)
+            if not os.path.exists(wheel_source):
+                raise ValueError("Wheel file not found:", wheel_source,
+                                 ". Please download the required wheel file to the wheels folder.")
+            release_files[os.path.join(_WHEELS_PATH, os.path.basename(wheel_file))] = wheel_source
 
     real_addon_name = "{addon_name}".format(addon_name=release_folder)
     if is_extension:
@@ -317,14 +1067,305 @@ def release_addon(target_init_file, addon_name,
         real_addon_name = f"{real_addon_name}_{timestamp}"
 
     released_addon_path = os.path.abspath(os.path.join(release_dir, real_addon_name) + ".zip")
-    # zip the addon
+    # zip the addon, files are written into the zip directly without a release folder
+    # 直接将文件写入压缩包 不再生成发布目录
     if need_zip:
-        zip_folder(release_folder, real_addon_name, is_extension)
+        write_release_zip(released_addon_path, release_files, import_rewriter, "" if is_extension else addon_name,
+                          generated_files)
         print("Add on released:", released_addon_path)
+    else:
+        os.mkdir(release_folder)
+        for relative_path, source_file in release_files.items():
+            stage_release_file(release_folder, relative_path, source_file, import_rewriter)
+        for relative_path, content in generated_files.items():
+            generated_file = os.path.join(release_folder, relative_path)
+            os.makedirs(os.path.dirname(generated_file), exist_ok=True)
+            write_utf8(generated_file, content)
 
     return released_addon_path
 
 
+def compile_release_translations(addon_name, release_files: dict) -> tuple[dict, list]:
+    """
+    Compile common/i18n/dictionary.py and the i18n/dictionary.py of the addon into translation catalogs, see
+    common.class_loader.translation_catalog. The dictionary files are executed without Blender, if one of them can not
+    be executed the addon is released without catalogs and loads its dictionaries as in development.
+
+    Returns:
+        tuple: ({relative path: content} of the catalogs, names of the dictionary modules that only hold data, they
+                are not imported by auto_load and are left out of the release if possible, see
+                find_removable_compiled_modules)
+    """
+    common_dictionary_file = os.path.join("common", "i18n", "dictionary.py")
+    addon_dictionary_file = os.path.join(_ADDONS_FOLDER, addon_name, "i18n", "dictionary.py")
+    if common_dictionary_file not in release_files:
+        # the addon does not use common.i18n
+        return {}, []
+    addon_dictionary_module = f"{_ADDONS_FOLDER}.{addon_name}.i18n.dictionary"
+    dictionaries = []
+    # common.i18n.i18n only imports the common dictionary when there is no compiled catalog
+    compiled_modules = ["common.i18n.dictionary"]
+    try:
+        dictionaries.append(runpy.run_path(release_files[common_dictionary_file])["common_dictionary"])
+        if addon_dictionary_file in release_files:
+            namespace = runpy.run_path(release_files[addon_dictionary_file], run_name=addon_dictionary_module)
+            dictionaries.append(namespace["dictionary"])
+            # classes or register functions in the dictionary module still need auto_load to import it
+            if not any(name in ("register", "unregister")
+                       or (isinstance(value, type) and value.__module__ == addon_dictionary_module)
+                       for name, value in namespace.items()):
+                compiled_modules.append(addon_dictionary_module)
+    except Exception as e:
+        print(f"Warning: translations of {addon_name} are not compiled:", repr(e))
+        return {}, []
+    return compile_translation_catalogs(merge_dictionaries(*dictionaries)), compiled_modules
+
+
+def _module_name_of(relative_path) -> str:
+    parts = os.path.splitext(relative_path.replace(os.sep, "/"))[0].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def find_removable_compiled_modules(py_sources: dict, compiled_modules) -> set:
+    """
+    Compiled modules that no released module needs: a module may only be left out of the release if every import of it
+    is in another removed module or under a condition on has_compiled_catalogs(), i.e. only runs in development.
+    py_sources is {path relative to the release folder, "/" separated: source code}.
+    """
+    importers = {}
+    for relative_path, source in py_sources.items():
+        module_name = _module_name_of(relative_path)
+        package = module_name if relative_path.endswith("/__init__.py") else module_name.rpartition(".")[0]
+        for imported_module in _unguarded_imports(ast.parse(source.lstrip("\ufeff"), filename=relative_path),
+                                                  package):
+            importers.setdefault(imported_module, set()).add(module_name)
+    removable = set(compiled_modules) & {_module_name_of(relative_path) for relative_path in py_sources}
+    changed = True
+    while changed:
+        changed = False
+        for module_name in list(removable):
+            if importers.get(module_name, set()) - removable:
+                removable.discard(module_name)
+                changed = True
+    return removable
+
+
+def _unguarded_imports(tree, package: str) -> set:
+    # absolute names of the modules imported outside of `if ... has_compiled_catalogs() ...` blocks
+    package_parts = package.split(".") if package else []
+    imported_modules = set()
+
+    def visit(node):
+        if isinstance(node, ast.If) and any(isinstance(name, ast.Name) and name.id == "has_compiled_catalogs"
+                                            for name in ast.walk(node.test)):
+            return
+        if isinstance(node, ast.Import):
+            imported_modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level > 0:
+                if node.level - 1 > len(package_parts):
+                    return
+                base = package_parts[:len(package_parts) - (node.level - 1)]
+                module = ".".join(base + ([node.module] if node.module else []))
+            else:
+                module = node.module
+            imported_modules.add(module)
+            imported_modules.update(f"{module}.{alias.name}" for alias in node.names)
+        for child in ast.iter_child_nodes(node):
+            visit(child)
+
+    visit(tree)
+    return imported_modules
+
+
+def release_addons(addon_names: list, workers=None, scan_workers=None, module_index: ModuleIndex = None,
+                   import_graph_cache: dict = None, file_scanner: FileScanner = None, **release_options) -> dict:
+    """
+    Release several addons concurrently, release_options are passed to release_addon.
+    The dependencies of all addons are analyzed first with one module index, one import graph cache and one file
+    scanner, so the files shared by the addons (e.g. the common folder) are scanned only once. The addons are then
+    packaged by a pool of `workers` threads (default: number of cpus).
+    module_index, import_graph_cache and file_scanner are created if they are not provided, a provided cache is saved
+    by the caller.
+    Returns {addon name: released zip path}, raises ValueError after the summary is printed if any addon failed.
+    同时发布多个插件 共享依赖分析的缓存 并打印每个插件的耗时
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    is_extension = release_options.get("is_extension", IS_EXTENSION)
+    start_time = time.perf_counter()
+    if module_index is None:
+        module_index = ModuleIndex(PROJECT_ROOT)
+    save_cache = import_graph_cache is None
+    if save_cache:
+        import_graph_cache = load_import_graph_cache(PROJECT_ROOT, module_index)
+    if file_scanner is None:
+        file_scanner = FileScanner()
+    timings = {addon_name: {} for addon_name in addon_names}
+    errors = {}
+    release_files = {}
+    for addon_name in addon_names:
+        analysis_start = time.perf_counter()
+        try:
+            check_release_target(release_options.get("release_dir", DEFAULT_RELEASE_DIR), addon_name, is_extension)
+            release_files[addon_name] = collect_release_files(get_init_file_path(addon_name), addon_name,
+                                                              scan_workers, module_index=module_index,
+                                                              import_graph_cache=import_graph_cache,
+                                                              file_scanner=file_scanner)
+        except Exception as e:
+            errors[addon_name] = e
+        timings[addon_name]["analysis"] = time.perf_counter() - analysis_start
+    if save_cache:
+        save_import_graph_cache(PROJECT_ROOT, import_graph_cache)
+
+    def release(addon_name):
+        package_start = time.perf_counter()
+        try:
+            return release_addon(get_init_file_path(addon_name), addon_name, release_files=release_files[addon_name],
+                                 **release_options)
+        finally:
+            timings[addon_name]["package"] = time.perf_counter() - package_start
+
+    released = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {addon_name: executor.submit(release, addon_name) for addon_name in release_files}
+        for addon_name, future in futures.items():
+            try:
+                released[addon_name] = future.result()
+            except Exception as e:
+                errors[addon_name] = e
+
+    print(f"Released {len(released)}/{len(addon_names)} addons in {time.perf_counter() - start_time:.2f} s")
+    name_width = max(len(addon_name) for addon_name in addon_names)
+    for addon_name in addon_names:
+        timing = timings[addon_name]
+        result = f"failed: {errors[addon_name]}" if addon_name in errors else released[addon_name]
+        print(f"  {addon_name:<{name_width}}  analysis {timing.get('analysis', 0):.2f} s"
+              f"  package {timing.get('package', 0):.2f} s  {result}")
+    if len(errors) > 0:
+        raise ValueError("Release failed for addons:", ", ".join(errors))
+    return released
+
+
+def get_all_addon_names() -> list:
+    # all addons under the addons folder, sorted by name
+    return sorted(name for name in os.listdir(_ADDON_ROOT)
+                  if os.path.isfile(os.path.join(_ADDON_ROOT, name, "__init__.py"))
+                  and bool(_addon_namespace_pattern.match(name)))
+
+
+def check_release_target(release_dir, addon_name, is_extension):
+    # if release dir is under PROJECT_ROOT, it's not allowed
+    if is_subdirectory(release_dir, PROJECT_ROOT):
+        # 不要将插件发布目录设置在当前项目内
+        raise ValueError("Invalid release dir:", release_dir,
+                         "Please set a release/test dir outside the current workspace")
+
+    if not bool(_addon_namespace_pattern.match(addon_name)):
+        raise ValueError("InValid addon_name:", addon_name, "Please name it as a python package name")
+
+    if is_extension:
+        # 发布为扩展时，请确保您在config.py正确的定义了__addon_name__
+        # Release as extension, please make sure you defined __addon_name__ correctly in config.py"
+        # Make sure toml file exists
+        addon_config_file = os.path.join(_ADDON_ROOT, addon_name, _ADDON_MANIFEST_FILE)
+        if not os.path.isfile(addon_config_file):
+            raise ValueError("Extension config file not found:", addon_config_file)
+
+
+def collect_release_files(target_init_file, addon_name, scan_workers=None, module_index: ModuleIndex = None,
+                          import_graph_cache: dict = None, file_scanner: FileScanner = None,
+                          include_tests=False) -> dict[str, str]:
+    """
+    Collect every file that goes into the release folder of an addon.
+    The root __init__.py is mapped to target_init_file, it is generated as a bootstrap file by stage_release_file.
+    scan_workers is the number of processes used to parse py files when analyzing dependencies, module_index and
+    import_graph_cache can be shared when collecting the files of several addons, see find_all_dependencies.
+    file_scanner memoizes the walks of the addon folders, .git, __pycache__ and virtual environments are skipped.
+    Test modules (test_*.py) are only collected with include_tests, i.e. when the addon is staged for test.
+    收集发布目录中的所有文件 返回 {发布目录内的相对路径: 源文件路径}
+    """
+    addon_folder = os.path.join(_ADDON_ROOT, addon_name)
+    if file_scanner is None:
+        file_scanner = FileScanner()
+    release_files = {"__init__.py": target_init_file}
+
+    # 将target_init_file同级的其他非py文件复制到发布目录 如 toml xml等可能跟插件有关的配置文件
+    for file in os.listdir(os.path.dirname(target_init_file)):
+        file_path = os.path.join(os.path.dirname(target_init_file), file)
+        if os.path.isdir(file_path) or file.endswith(".py") or _is_pyc_file(file):
+            continue
+        release_files[file] = file_path
+
+    # 插件文件夹中的所有文件 pyc files are auto generated, they are not part of the release
+    for file_path in file_scanner.search_files(addon_folder):
+        if _is_pyc_file(file_path) or (not include_tests and _is_test_module(file_path)):
+            continue
+        release_files[os.path.join(_ADDONS_FOLDER, addon_name, os.path.relpath(file_path, addon_folder))] = file_path
+    release_files[os.path.join(_ADDONS_FOLDER, "__init__.py")] = os.path.join(_ADDON_ROOT, "__init__.py")
+
+    # 对插件文件夹中的每一个py文件进行分析，找到每个py文件中依赖的其他py文件
+    visited_py_files = set()
+    for py_file in file_scanner.search_files(addon_folder, {".py"}):
+        if include_tests or not _is_test_module(py_file):
+            visited_py_files.add(os.path.abspath(py_file))
+    # 注意不要漏掉__init__.py文件
+    visited_py_files.add(os.path.abspath(os.path.join(_ADDON_ROOT, "__init__.py")))
+
+    dependencies = find_all_dependencies(list(visited_py_files), PROJECT_ROOT, workers=scan_workers,
+                                         module_index=module_index, cache=import_graph_cache)
+    for dependency in dependencies:
+        dependency = os.path.abspath(dependency)
+        if dependency in visited_py_files:
+            continue
+        visited_py_files.add(dependency)
+        release_files.setdefault(os.path.relpath(dependency, PROJECT_ROOT), dependency)
+    return release_files
+
+
+def stage_release_file(release_folder, relative_path, source_file, import_rewriter: ImportRewriter, content=None):
+    """
+    Write a file of collect_release_files into the release folder, the imports of py files are rewritten.
+    content is the result of build_release_file if it was already built. Returns the written content, None if the
+    file was copied unchanged.
+    """
+    target_path = os.path.join(release_folder, relative_path)
+    if not os.path.exists(os.path.dirname(target_path)):
+        os.makedirs(os.path.dirname(target_path))
+    if content is None:
+        content = build_release_file(relative_path, source_file, import_rewriter)
+    if content is None:
+        shutil.copy(source_file, target_path)
+    else:
+        with open(target_path, "wb") as f:
+            f.write(content)
+    return content
+
+
+def build_release_file(relative_path, source_file, import_rewriter: ImportRewriter):
+    """
+    Return the released content of a file of collect_release_files as bytes, or None if it is released unchanged.
+    The root __init__.py is the bootstrap file, the imports of other py files are rewritten.
+    """
+    if relative_path == "__init__.py":
+        return generate_bootstrap_init_file(import_rewriter.namespace, get_addon_info(source_file)).encode("utf-8")
+    if not relative_path.endswith(".py"):
+        return None
+    with open(source_file, "rb") as f:
+        content = f.read()
+    source = content.decode("utf-8")
+    rewritten = import_rewriter.rewrite(source, relative_path)
+    if rewritten != source:
+        return rewritten.encode("utf-8")
+    return content
+
+
+def _is_pyc_file(file_path):
+    return file_path.lower().endswith("pyc")
+
+
 def get_addon_info(filename: str):
     file_content = read_utf8(filename)
     try:
@@ -361,13 +1402,6 @@ def unregister():
     return bootstrap_init_file_template.format(addon_name=addon_name, bl_info=bl_info_str)
 
 
-# pyc files are auto generated, need to be removed before release
-def remove_pyc_files(release_folder: str):
-    all_pyc_file = search_files(release_folder, {"pyc"})
-    for pyc_file in all_pyc_file:
-        os.remove(pyc_file)
-
-
 def remove_empty_folders(root_path):
     all_folder_to_remove = []
     for root, dirnames, filenames in os.walk(root_path, topdown=False):
@@ -380,304 +1414,886 @@ def remove_empty_folders(root_path):
     return len(all_folder_to_remove)
 
 
-# Zip the folder in a way that blender can recognize it as an addon.
-def zip_folder(target_root, output_zip_file, is_extension):
-    if is_extension:
-        shutil.make_archive(output_zip_file, 'zip', Path(target_root))
-    else:
-        shutil.make_archive(output_zip_file, 'zip', Path(target_root).parent, base_dir=os.path.basename(target_root))
+# Zip the files in a way that blender can recognize it as an addon.
+# Legacy addons are zipped under a folder named base_dir, extensions are zipped at the root of the zip file.
+# generated_files are {relative path: content} of files that do not exist in the workspace.
+def write_release_zip(zip_path, release_files: dict, import_rewriter: ImportRewriter, base_dir="",
+                      generated_files: dict = None):
+    temp_zip_path = zip_path + ".tmp"
+    written_folders = set()
+
+    def write_folders(zip_file, arcname, date_time):
+        # folder entries, the same as the ones written by shutil.make_archive
+        folder_parts = arcname.split("/")[:-1]
+        for i in range(1, len(folder_parts) + 1):
+            folder = "/".join(folder_parts[:i]) + "/"
+            if folder not in written_folders:
+                written_folders.add(folder)
+                folder_info = zipfile.ZipInfo(folder, date_time)
+                folder_info.external_attr = (0o40775 << 16) | 0x10
+                zip_file.writestr(folder_info, b"")
+
+    with zipfile.ZipFile(temp_zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for relative_path in sorted(release_files):
+            source_file = release_files[relative_path]
+            arcname = "/".join(part for part in (base_dir, relative_path.replace(os.sep, "/")) if part)
+            write_folders(zip_file, arcname, time.localtime(os.path.getmtime(source_file))[:6])
+            content = build_release_file(relative_path, source_file, import_rewriter)
+            if content is None:
+                zip_file.write(source_file, arcname)
+            else:
+                file_info = zipfile.ZipInfo.from_file(source_file, arcname)
+                file_info.compress_type = zipfile.ZIP_DEFLATED
+                zip_file.writestr(file_info, content)
+        for relative_path, content in (generated_files or {}).items():
+            arcname = "/".join(part for part in (base_dir, relative_path.replace(os.sep, "/")) if part)
+            write_folders(zip_file, arcname, time.localtime()[:6])
+            zip_file.writestr(zipfile.ZipInfo(arcname, time.localtime()[:6]), content.encode("utf-8"),
+                              compress_type=zipfile.ZIP_DEFLATED)
+    os.replace(temp_zip_path, zip_path)
 
 
 def find_imported_modules(file_path):
-    root = ast.parse(read_utf8(file_path), filename=file_path)
+    return parse_imported_modules(read_utf8(file_path), file_path)
 
-    imported_modules = set()
-    for node in ast.walk(root):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                imported_modules.add(alias.name)
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                module_name = node.module
-                imported_modules.add(module_name)
-            for alias in node.names:
-                if node.module:
-                    imported_modules.add(f"{node.module}.{alias.name}")
-                else:
-                    imported_modules.add(alias.name)
-    return imported_modules
 
+def resolve_module_path(module_name, base_path, project_root, module_index: ModuleIndex = None):
+    # Build the ModuleIndex once and pass it in when resolving many modules
+    if module_index is None:
+        module_index = ModuleIndex(project_root)
+    return module_index.resolve(module_name, base_path)
 
-def resolve_module_path(module_name, base_path, project_root):
-    if not module_name.endswith(".*"):
-        # Handle import all
-        module_path = module_name.replace('.', '/')
-        module_path = os.path.join(project_root, module_path)
-        if os.path.isdir(module_path):
-            module_path = os.path.join(module_path, '__init__.py')
-            return [module_path]
-        elif os.path.isfile(module_path + '.py'):
-            module_path = module_path + '.py'
-            return [module_path]
-        else:
-            if "." not in module_name:
-                # most likely a standard library module
-                # 有一种可能是相对导入 from . import xxx, from .. import xxx 等
-                # 这种情况下需要根据当前文件的路径来解析 看module_name.py是否存在于当前文件的同级目录或者父级目录
-                # 从base_path开始向上查找，直到找到module_name.py或者到达project_root
-                search_path = os.path.dirname(base_path)
-                potential_result = []
-                while is_subdirectory(search_path, project_root):
-                    possible_path = os.path.join(search_path, module_name + '.py')
-                    if os.path.isfile(possible_path):
-                        potential_result.append(possible_path)
-                    search_path = os.path.dirname(search_path)
-                return potential_result
-            current_search_dir = os.path.dirname(base_path)
-            while is_subdirectory(current_search_dir, project_root):
-                module_path = module_name.replace('.', '/')
-                module_path = os.path.join(current_search_dir, module_path)
-                if os.path.isdir(module_path):
-                    module_path = os.path.join(module_path, '__init__.py')
-                    return [module_path]
-                elif os.path.isfile(module_path + '.py'):
-                    module_path = module_path + '.py'
-                    return [module_path]
-                current_search_dir = os.path.dirname(current_search_dir)
-            return []
-    else:
-        module_name = module_name[:-2]
-        module_path = module_name.replace('.', '/')
-        possible_root_path = os.path.join(project_root, module_path)
-        if os.path.isdir(possible_root_path):
-            possible_root_path = os.path.join(possible_root_path, '__init__.py')
-            return [possible_root_path]
-        elif os.path.isfile(possible_root_path + '.py'):
-            possible_root_path = possible_root_path + '.py'
-            return [possible_root_path]
-        else:
-            current_search_dir = os.path.dirname(base_path)
-            while is_subdirectory(current_search_dir, project_root):
-
-                possible_root_path = os.path.join(current_search_dir, module_path)
-                if os.path.isdir(possible_root_path):
-                    possible_root_path = os.path.join(possible_root_path, '__init__.py')
-                    return [possible_root_path]
-                elif os.path.isfile(possible_root_path + '.py'):
-                    possible_root_path = possible_root_path + '.py'
-                    return [possible_root_path]
-                current_search_dir = os.path.dirname(current_search_dir)
-            return []
-
-
-def find_all_dependencies(file_paths: list, project_root: str):
-    dependencies = set()
-    to_process = file_paths.copy()
-    processed = set()
-
-    while to_process:
-        current_file = os.path.abspath(to_process.pop())
-        if current_file in processed:
-            continue
 
-        processed.add(current_file)
-        dependencies.add(current_file)
+def find_all_dependencies(file_paths: list, project_root: str, use_cache=True, workers=None,
+                          module_index: ModuleIndex = None, cache: dict = None):
+    """
+    Find all py files under project_root that the given files depend on, including the given files themselves.
+    When use_cache is True, the imports of each file are read from the persistent import graph cache, only files that
+    changed since the last scan are parsed again. See dependency_cache_stats for the hit/miss counts of the last scan.
+    The dependency graph is walked level by level, files of a level that need to be parsed are parsed by a pool of
+    `workers` processes (default: number of cpus) when there are enough of them, otherwise they are parsed serially.
+    Imports are resolved with module_index, a new one is built from project_root if it is not provided.
+    A cache loaded by load_import_graph_cache can be passed to share it between several calls, it is then saved by the
+    caller instead.
+    """
+    dependency_cache_stats["hits"] = 0
+    dependency_cache_stats["misses"] = 0
+    if module_index is None:
+        module_index = ModuleIndex(project_root)
+    save_cache = use_cache and cache is None
+    if save_cache:
+        cache = load_import_graph_cache(project_root, module_index)
+    elif cache is None:
+        cache = {"files": {}, "dirty": False}
+    if workers is None:
+        workers = os.cpu_count() or 1
 
-        try:
-            imported_modules = find_imported_modules(current_file)
-        except SyntaxError as e:
-            raise SyntaxError(f"Syntax error in file {current_file}: {e}")
-
-        # 以下代码会将除了当前目标插件文件夹以外的其他被引用的文件夹中的__init__.py文件也加入到依赖中，使之成为有效的模块，从而将其中的Blender
-        # 类也加入到自动注册的范围中，一般来说，我们引用外部文件夹的目的是复用其内部函数，而非将插件外部模块中定义的Operator，Panel等元素
-        # 直接加到当前插件中(如果需要使用其他插件的这些元素，更好的做法是将其直接存放到你的插件文件夹内)，因此注释掉，如果您有特殊需求，可以取消注释
-        # The following code will add __init__.py files in other
-        # referenced folders to the dependencies, in addition to the current ACTIVE ADDON ,making those folders valid
-        # modules and thus classes in them will be added the scope of automatic class registration. (The
-        # auto_load.py) It is commented out because usually we just want to reference reusable functions from
-        # modules outside the current addon Instead of directly adding their Operator's Panels into your own addon. (
-        # If you really want to do that, include them as sub package of your own addon would be a better option). But
-        # If you have special requirements, you can uncomment it.
-
-        # potential_init_file = os.path.abspath(os.path.join(os.path.dirname(current_file), '__init__.py'))
-        # while is_subdirectory(os.path.dirname(potential_init_file),
-        #                       project_root) and potential_init_file != os.path.abspath(
-        #         os.path.join(project_root, "__init__.py")):
-        #     if os.path.exists(potential_init_file) and potential_init_file not in processed:
-        #         to_process.append(potential_init_file)
-        #         dependencies.add(potential_init_file)
-        #     potential_init_file = os.path.abspath(
-        #         os.path.join(os.path.dirname(os.path.dirname(potential_init_file)), '__init__.py'))
-
-        for module in imported_modules:
-            module_path = resolve_module_path(module, current_file, project_root)
-            if len(module_path) > 0:
-                for each_module_path in module_path:
-                    each_module_path = os.path.abspath(each_module_path)
-                    if each_module_path not in processed:
-                        to_process.append(each_module_path)
-
-    return dependencies
-
-
-def enhance_import_for_py_files(addon_dir: str):
-    namespace = os.path.basename(addon_dir)
-    all_py_modules = find_all_py_modules(addon_dir)
-    all_py_file = search_files(addon_dir, {".py"})
-    for py_file in all_py_file:
-        hasUpdated = False
-        content = read_utf8(py_file)
-        for module_path in _import_module_pattern.finditer(content):
-            original_module_path = module_path.groups()[0]
-            if original_module_path in all_py_modules:
-                hasUpdated = True
-                content = content.replace("from " + original_module_path + " import",
-                                          "from " + namespace + "." + original_module_path + " import")
-        if hasUpdated:
-            write_utf8(py_file, content)
-
-
-def convert_absolute_to_relative(file_path: str, project_root: str):
-    """
-    Convert all absolute imports to relative imports in a Python file.
-    Notice this does not handle import like
-    import xxx.yyy.zzz as zzz
-    在开发扩展时，不要用这种方式导入项目内的模块，这种方式导入的模块无法被转换为相对导入
+    processed = set()
+    frontier = {os.path.abspath(file_path) for file_path in file_paths}
+    executor = None
+    try:
+        while frontier:
+            processed.update(frontier)
+            entries = {file_path: lookup_import_graph_cache(file_path, cache) for file_path in sorted(frontier)}
+            files_to_parse = [file_path for file_path, entry in entries.items() if entry["modules"] is None]
+            dependency_cache_stats["misses"] += len(files_to_parse)
+            dependency_cache_stats["hits"] += len(entries) - len(files_to_parse)
+            if workers > 1 and len(files_to_parse) >= _PARALLEL_PARSE_MIN_FILES:
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                parsed_modules = executor.map(parse_imported_modules_in_file, files_to_parse,
+                                              chunksize=max(1, len(files_to_parse) // (workers * 4)))
+            else:
+                parsed_modules = map(parse_imported_modules_in_file, files_to_parse)
+            for file_path, imported_modules in zip(files_to_parse, parsed_modules):
+                entries[file_path]["modules"] = imported_modules
+
+            next_frontier = set()
+            for file_path, entry in entries.items():
+                if entry["dependencies"] is None:
+                    entry["dependencies"] = resolve_dependencies(entry["modules"], file_path, module_index)
+                    cache["dirty"] = True
+                next_frontier.update(entry["dependencies"])
+
+            # 以下代码会将除了当前目标插件文件夹以外的其他被引用的文件夹中的__init__.py文件也加入到依赖中，使之成为有效的模块，从而将其中的Blender
+            # 类也加入到自动注册的范围中，一般来说，我们引用外部文件夹的目的是复用其内部函数，而非将插件外部模块中定义的Operator，Panel等元素
+            # 直接加到当前插件中(如果需要使用其他插件的这些元素，更好的做法是将其直接存放到你的插件文件夹内)，因此注释掉，如果您有特殊需求，可以取消注释
+            # The following code will add __init__.py files in other
+            # referenced folders to the dependencies, in addition to the current ACTIVE ADDON ,making those folders valid
+            # modules and thus classes in them will be added the scope of automatic class registration. (The
+            # auto_load.py) It is commented out because usually we just want to reference reusable functions from
+            # modules outside the current addon Instead of directly adding their Operator's Panels into your own addon.
+            # (If you really want to do that, include them as sub package of your own addon would be a better option).
+            # But If you have special requirements, you can uncomment it.
+
+            # for file_path in entries:
+            #     potential_init_file = os.path.abspath(os.path.join(os.path.dirname(file_path), '__init__.py'))
+            #     while is_subdirectory(os.path.dirname(potential_init_file),
+            #                           project_root) and potential_init_file != os.path.abspath(
+            #             os.path.join(project_root, "__init__.py")):
+            #         if os.path.exists(potential_init_file):
+            #             next_frontier.add(potential_init_file)
+            #         potential_init_file = os.path.abspath(
+            #             os.path.join(os.path.dirname(os.path.dirname(potential_init_file)), '__init__.py'))
+
+            frontier = next_frontier - processed
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-    Args:
-        file_path (str): Path to the Python file to modify.
-        project_root (str): Root directory of the project.
-    """
-    # Normalize paths
-    file_path = os.path.abspath(file_path)
-    project_root = os.path.abspath(project_root)
+    if save_cache:
+        save_import_graph_cache(project_root, cache)
+    return processed
 
-    lines = read_utf8_in_lines(file_path)
 
-    modified_lines = []
-    changed = False
+def resolve_dependencies(imported_modules, file_path, module_index: ModuleIndex) -> list:
+    resolved = set()
+    for module in imported_modules:
+        for each_module_path in module_index.resolve(module, file_path):
+            resolved.add(os.path.abspath(each_module_path))
+    return sorted(resolved)
 
-    for line in lines:
-        # help skipping expensive path check
-        stripped_line = line.strip()
-        if (not stripped_line.startswith("from ")) or stripped_line.startswith("from ."):
-            # Leave non-import lines unchanged
-            modified_lines.append(line)
-            continue
-        match = _absolute_import_pattern.match(line)
-        if match:
-            # get whitespace before the import statement
-            leading_space = line[:line.index("from")]
-            absolute_module = match.group(1)
-            import_items = match.group(2)
-            # Check if the absolute module is within the project
-            absolute_module_path = absolute_module.replace('.', os.sep)
-            full_module_path = os.path.join(project_root, absolute_module_path)
-            if os.path.exists(full_module_path) or os.path.exists(f"{full_module_path}.py"):
-                # Calculate the relative import path
-
-                target_relative_path = os.path.relpath(
-                    os.path.join(project_root, absolute_module_path),
-                    os.path.dirname(file_path)
-                )
-                # Count the levels for leading dots
-                levels_up = target_relative_path.count("..") + 1
-                leading_dots = '.' * levels_up
-
-                # Build the relative import line
-                target_relative_path = target_relative_path.strip("." + os.sep)
-                relative_import_line = leading_space + f"from {leading_dots}{target_relative_path.replace(os.sep, '.')} import {import_items}\n"
-                if relative_import_line != line:
-                    modified_lines.append(relative_import_line)
-                    changed = True
-                    continue
-            else:
-                # Leave non-matching lines unchanged
-                modified_lines.append(line)
-        else:
-            # Leave non-matching lines unchanged
-            modified_lines.append(line)
-        # print(f"not match {line} in {timer() - start3} seconds")
 
-    # Write the modified content back to the file if changes were made
-    if changed:
-        write_utf8_in_lines(file_path, modified_lines)
+# Persistent import graph cache 持久化的导入关系缓存
+# The imported modules of a file only depend on its content, a file is considered unchanged when its size and mtime
+# are unchanged, or when its content hash is unchanged (e.g. after switching git branch back and forth).
+# The resolved dependency paths also depend on the layout of the project (which py files and folders exist), they are
+# resolved again from the cached imported modules whenever the layout changes.
+_CACHE_FOLDER = ".framework_cache"
+_IMPORT_GRAPH_CACHE_FILE = "import_graph.json"
+_IMPORT_GRAPH_CACHE_VERSION = 1
+# do not start a process pool for fewer files, the pool itself takes longer to start than parsing them
+_PARALLEL_PARSE_MIN_FILES = 32
 
+dependency_cache_stats = {"hits": 0, "misses": 0}
 
-def find_all_py_modules(root_dir: str) -> set:
-    all_py_modules = set()
-    all_py_file = search_files(root_dir, {".py"})
-    for py_file in all_py_file:
-        rel_path = str(os.path.relpath(py_file, root_dir))
-        modules = rel_path.replace("__init__.py", "").replace(".py", "").split(os.path.sep)
-        if len(modules[-1]) == 0:
-            modules = modules[0:-1]
 
-        module_name = ""
-        for i in range(len(modules)):
-            module_name += modules[i] + "."
-            all_py_modules.add(module_name[0:-1])
-    return all_py_modules
+def load_import_graph_cache(project_root, module_index: ModuleIndex) -> dict:
+    cache_file = os.path.join(project_root, _CACHE_FOLDER, _IMPORT_GRAPH_CACHE_FILE)
+    cache = {}
+    if os.path.isfile(cache_file):
+        try:
+            cache = json.loads(read_utf8(cache_file))
+        except ValueError:
+            cache = {}
+    if cache.get("version") != _IMPORT_GRAPH_CACHE_VERSION:
+        cache = {"version": _IMPORT_GRAPH_CACHE_VERSION, "layout": None, "files": {}}
+    cache["dirty"] = False
+    refresh_import_graph_cache_layout(cache, module_index)
+    return cache
+
+
+def refresh_import_graph_cache_layout(cache: dict, module_index: ModuleIndex):
+    # call it when a cache is kept while module_index is rebuilt, see BuildDaemon
+    layout = module_index.layout_key()
+    if cache["layout"] != layout:
+        # files were added or removed, forget deleted files and resolve the dependencies again
+        cache["files"] = {path: entry for path, entry in cache["files"].items() if os.path.isfile(path)}
+        for entry in cache["files"].values():
+            entry["dependencies"] = None
+        cache["layout"] = layout
+        cache["dirty"] = True
+
+
+def save_import_graph_cache(project_root, cache: dict):
+    if not cache.pop("dirty", True):
+        return
+    cache_folder = os.path.join(project_root, _CACHE_FOLDER)
+    os.makedirs(cache_folder, exist_ok=True)
+    cache_file = os.path.join(cache_folder, _IMPORT_GRAPH_CACHE_FILE)
+    # write to a temp file first so that concurrent releases never read a half written cache
+    temp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write_utf8(temp_file, json.dumps(cache))
+    os.replace(temp_file, cache_file)
 
 
-def start_watch_for_update(init_file, addon_name, stop_event: threading.Event):
+def lookup_import_graph_cache(file_path, cache: dict) -> dict:
+    """
+    Return the cache entry of file_path. The "modules" of the entry is None if the file changed and needs to be parsed,
+    the "dependencies" of the entry is None if they need to be resolved again.
+    """
+    file_stat = os.stat(file_path)
+    entry = cache["files"].get(file_path)
+    if entry is not None and entry["size"] == file_stat.st_size and entry["mtime_ns"] == file_stat.st_mtime_ns:
+        return entry
+    content_hash = get_md5(file_path)
+    if entry is None or entry["hash"] != content_hash:
+        entry = {"hash": content_hash, "modules": None, "dependencies": None}
+        cache["files"][file_path] = entry
+    entry["size"] = file_stat.st_size
+    entry["mtime_ns"] = file_stat.st_mtime_ns
+    cache["dirty"] = True
+    return entry
+
+
+def start_watch_for_update(init_file, addon_name, stop_event: threading.Event, notifier: ReloadNotifier = None,
+                           debounce=DEFAULT_WATCH_DEBOUNCE):
+    """
+    Watch the files of the addon and update the addon for test when they change.
+    Only the addon folder and the folders of its dependencies are watched, a burst of changes (e.g. saving many files
+    or switching git branch) is coalesced into a single update once no change happened for `debounce` seconds.
+    """
     install_if_missing("watchdog")
     from watchdog.events import FileSystemEventHandler
     from watchdog.observers import Observer
 
+    addon_folder = os.path.join(_ADDON_ROOT, addon_name)
+
     class FileUpdateHandler(FileSystemEventHandler):
         def __init__(self):
             super(FileUpdateHandler, self).__init__()
-            self.has_update = False
+            self.has_update = threading.Event()
+            # source files of the last staged build outside the addon folder
+            self.dependency_files = set()
+            self._changed_paths = set()
+            self._last_change_time = 0
+            self._lock = threading.Lock()
 
         def on_any_event(self, event):
-            source_path = event.src_path
-            if source_path.endswith(".py"):
-                self.has_update = True
-
-        def clear_update(self):
-            self.has_update = False
+            # opened/closed events are also fired when the files are read during the update
+            if event.is_directory or event.event_type not in ("created", "modified", "deleted", "moved"):
+                return
+            for path in (event.src_path, getattr(event, "dest_path", None)):
+                if path and self.is_watched_file(os.path.abspath(path)):
+                    with self._lock:
+                        self._changed_paths.add(os.path.abspath(path))
+                        self._last_change_time = time.monotonic()
+                    self.has_update.set()
+
+        def is_watched_file(self, path):
+            if path in self.dependency_files:
+                return True
+            # any file in the addon folder may be part of the addon, including assets and blender_manifest.toml
+            return (is_subdirectory(path, addon_folder) and not _is_pyc_file(path)
+                    and "__pycache__" not in path.split(os.sep))
+
+        def seconds_since_last_change(self):
+            with self._lock:
+                return time.monotonic() - self._last_change_time
+
+        def take_changed_paths(self) -> set:
+            with self._lock:
+                changed_paths = self._changed_paths
+                self._changed_paths = set()
+                self.has_update.clear()
+            return changed_paths
+
+        def restore_changed_paths(self, changed_paths: set):
+            # the update failed, the paths are updated again with the next change
+            with self._lock:
+                self._changed_paths |= changed_paths
 
-    path = PROJECT_ROOT
     event_handler = FileUpdateHandler()
     observer = Observer()
-    observer.schedule(event_handler, path, recursive=True)
+    watches = {}
+
+    def schedule_watches():
+        # the dependency closure changes when imports change, watch the folders of the current closure only
+        staged_files = _load_stage_manifest(TEST_RELEASE_DIR, addon_name).get("files", {})
+        dependency_files = {entry["source"] for entry in staged_files.values()
+                            if not is_subdirectory(entry["source"], addon_folder)}
+        event_handler.dependency_files = dependency_files
+        folders = {os.path.dirname(file): False for file in dependency_files}
+        folders[addon_folder] = True
+        for folder in list(watches.keys()):
+            if folder not in folders:
+                observer.unschedule(watches.pop(folder))
+        for folder, recursive in folders.items():
+            if folder not in watches:
+                watches[folder] = observer.schedule(event_handler, folder, recursive=recursive)
+
+    schedule_watches()
     observer.start()
 
+    # after a failed update, the next one checks every file instead of trusting the files that were not reported
+    full_check = False
     try:
         while not stop_event.is_set():
-            time.sleep(1)
-            if event_handler.has_update:
-                try:
-                    update_addon_for_test(init_file, addon_name)
-                    event_handler.clear_update()
-                except Exception as e:
-                    print(e)
-                    print(
-                        "Addon updated failed: Please make sure no other process is"
-                        " using the addon folder. You might need to restart the test to update the addon in Blender.")
+            # wake up as soon as a file changes instead of sleeping a fixed interval
+            if not event_handler.has_update.wait(timeout=1):
+                continue
+            while not stop_event.is_set() and event_handler.seconds_since_last_change() < debounce:
+                time.sleep(max(debounce - event_handler.seconds_since_last_change(), 0.01))
+            changed_paths = event_handler.take_changed_paths()
+            try:
+                addon_md5 = update_addon_for_test(init_file, addon_name, None if full_check else changed_paths)
+                full_check = False
+                if addon_md5 is not None and notifier is not None:
+                    notifier.notify({"md5": addon_md5})
+                schedule_watches()
+            except Exception as e:
+                event_handler.restore_changed_paths(changed_paths)
+                full_check = True
+                print(e)
+                print(
+                    "Addon updated failed: Please make sure no other process is"
+                    " using the addon folder. You might need to restart the test to update the addon in Blender.")
         print("Stop watching for update...")
 
     except KeyboardInterrupt:
+        pass
+    finally:
         observer.stop()
         observer.join()
 
 
-def update_addon_for_test(init_file, addon_name):
+def update_addon_for_test(init_file, addon_name, changed_paths: set = None, module_index: ModuleIndex = None,
+                          import_graph_cache: dict = None, file_scanner: FileScanner = None):
+    # Returns the md5 of the updated addon, or None if nothing changed since the last update
+    # changed_paths are the source files reported by the file watcher, see stage_addon_for_test
+    # module_index, import_graph_cache and file_scanner can be shared between updates, see collect_release_files
     if BLENDER_ADDON_PATH is None:
         # 无法得到Blender插件路径 请检查在main.py或config.ini中的配置
         raise ValueError(
             "Could not find Blender addon installation path. Please check the configuration in main.py or config.ini")
-    addon_path = release_addon(init_file, addon_name, with_timestamp=False,
-                               is_extension=IS_EXTENSION,
-                               release_dir=TEST_RELEASE_DIR, need_zip=False)
-    executable_path = os.path.join(os.path.dirname(addon_path), addon_name)
+    start_time = time.perf_counter()
+    executable_path, changed_files, removed_files = stage_addon_for_test(init_file, addon_name,
+                                                                         release_dir=TEST_RELEASE_DIR,
+                                                                         is_extension=IS_EXTENSION,
+                                                                         changed_paths=changed_paths,
+                                                                         module_index=module_index,
+                                                                         import_graph_cache=import_graph_cache,
+                                                                         file_scanner=file_scanner)
+    stage_time = time.perf_counter()
 
     test_addon_path = os.path.join(BLENDER_ADDON_PATH, addon_name)
-    if os.path.exists(test_addon_path):
-        shutil.rmtree(test_addon_path)
-    shutil.copytree(executable_path, test_addon_path)
+    signature_file = os.path.join(test_addon_path, _addon_md5__signature)
+    manifest = _load_stage_manifest(TEST_RELEASE_DIR, addon_name)
+    synced_md5 = manifest.get("synced_md5")
+    # Blender addon folder is missing or was not written by the last staging, sync everything
+    # Blender插件目录不存在或者不是由上一次更新写入的 需要完整同步
+    full_sync = synced_md5 is None or not os.path.isfile(signature_file) or read_utf8(signature_file) != synced_md5
+    if not full_sync and len(changed_files) == 0 and len(removed_files) == 0:
+        return None
+
+    # the manifest used for selective reload and an MD5 to inform the addon content has been changed are published
+    # together with the files
+    addon_md5, file_digests = fingerprint_folder(executable_path, cache=_staged_file_digests,
+                                                 workers=os.cpu_count() or 1)
+    reload_manifest = build_reload_manifest(executable_path, addon_name, file_digests)
+    sync_stats = publish_addon_folder(executable_path, test_addon_path, file_digests.keys(),
+                                      None if full_sync else {path.replace(os.sep, "/") for path in changed_files},
+                                      {_addon_reload_manifest: json.dumps(reload_manifest),
+                                       _addon_md5__signature: addon_md5})
+    end_time = time.perf_counter()
+    print(f"Addon synced in {(end_time - start_time) * 1000:.1f} ms (stage {(stage_time - start_time) * 1000:.1f} ms,"
+          f" sync {(end_time - stage_time) * 1000:.1f} ms): {sync_stats['copied']} copied,"
+          f" {sync_stats['linked']} unchanged, {len(removed_files)} removed"
+          + ("" if sync_stats["atomic"] else ", updated in place"))
+
+    manifest["synced_md5"] = addon_md5
+    manifest["pending_sync"] = {"changed": [], "removed": []}
+    _save_stage_manifest(TEST_RELEASE_DIR, addon_name, manifest)
+    return addon_md5
+
+
+def publish_addon_folder(source_folder, target_folder, relative_paths, changed_files: set = None,
+                         generated_files: dict = None) -> dict:
+    """
+    Publish the files of source_folder into target_folder so that Blender never sees a half written addon.
+    A new folder is assembled next to the target, unchanged files are hard linked from the current target instead of
+    being copied, then the new folder is swapped in with two renames. Hidden folders are ignored by Blender when it
+    looks for addons. If the target folder can not be renamed (e.g. a file is opened by another process on Windows),
+    the files are replaced one by one with os.replace instead, generated files are written last.
+
+    Args:
+        relative_paths: Files of source_folder to publish, "/" separated.
+        changed_files: Files that changed since the last publish, None to copy every file.
+        generated_files: {relative path: content} of additional files to write into target_folder.
+
+    Returns:
+        dict: {"copied": number of copied files, "linked": number of reused files, "atomic": whether it was swapped}
+    """
+    generated_files = generated_files or {}
+    parent_folder, folder_name = os.path.split(os.path.normpath(target_folder))
+    new_folder = os.path.join(parent_folder, f".{folder_name}.sync-new")
+    old_folder = os.path.join(parent_folder, f".{folder_name}.sync-old")
+    for leftover_folder in (new_folder, old_folder):
+        if os.path.exists(leftover_folder):
+            shutil.rmtree(leftover_folder)
+    stats = {"copied": 0, "linked": 0, "atomic": True}
+    # sources whose bytecode compiled by Blender is still valid
+    linked_files = set()
+
+    def is_unchanged(relative_path):
+        return (changed_files is not None and relative_path not in changed_files
+                and os.path.isfile(os.path.join(target_folder, relative_path)))
+
+    for relative_path in relative_paths:
+        target_path = os.path.join(new_folder, relative_path)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        if is_unchanged(relative_path):
+            try:
+                os.link(os.path.join(target_folder, relative_path), target_path)
+                stats["linked"] += 1
+                linked_files.add(relative_path)
+                continue
+            except OSError:
+                # hard links are not supported by the file system
+                pass
+        shutil.copy(os.path.join(source_folder, relative_path), target_path)
+        stats["copied"] += 1
+    # keep the bytecode compiled by Blender for the unchanged files only. A pyc is validated by the source mtime in
+    # whole seconds and the source size, two edits of the same size within a second would leave stale bytecode
+    # 只保留未改变文件的字节码，pyc只通过源文件的秒级修改时间和大小校验，一秒内两次相同大小的修改会留下过期的字节码
+    for relative_path in _find_cached_bytecode(target_folder):
+        if _cached_source_of(relative_path) not in linked_files:
+            continue
+        try:
+            os.makedirs(os.path.dirname(os.path.join(new_folder, relative_path)), exist_ok=True)
+            os.link(os.path.join(target_folder, relative_path), os.path.join(new_folder, relative_path))
+        except OSError:
+            pass
+    for relative_path, content in generated_files.items():
+        write_utf8(os.path.join(new_folder, relative_path), content)
+
+    try:
+        if os.path.exists(target_folder):
+            os.rename(target_folder, old_folder)
+        try:
+            os.rename(new_folder, target_folder)
+        except OSError:
+            if os.path.exists(old_folder):
+                os.rename(old_folder, target_folder)
+            raise
+    except OSError as e:
+        print("Could not swap the addon folder, updating it in place:", e)
+        shutil.rmtree(new_folder, ignore_errors=True)
+        stats = {"copied": 0, "linked": 0, "atomic": False}
+        relative_paths = set(relative_paths)
+        for root, dirnames, filenames in os.walk(target_folder):
+            for filename in filenames:
+                relative_path = os.path.relpath(os.path.join(root, filename), target_folder).replace(os.sep, "/")
+                if (relative_path not in relative_paths and relative_path not in generated_files
+                        and "__pycache__" not in relative_path.split("/")):
+                    os.remove(os.path.join(root, filename))
+        for relative_path in _find_cached_bytecode(target_folder):
+            if not is_unchanged(_cached_source_of(relative_path)):
+                os.remove(os.path.join(target_folder, relative_path))
+        for relative_path in relative_paths:
+            if is_unchanged(relative_path):
+                stats["linked"] += 1
+                continue
+            target_path = os.path.join(target_folder, relative_path)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            shutil.copy(os.path.join(source_folder, relative_path), target_path + ".sync-tmp")
+            os.replace(target_path + ".sync-tmp", target_path)
+            stats["copied"] += 1
+        while remove_empty_folders(target_folder) > 0:
+            pass
+        for relative_path, content in generated_files.items():
+            write_utf8(os.path.join(target_folder, relative_path) + ".sync-tmp", content)
+            os.replace(os.path.join(target_folder, relative_path) + ".sync-tmp",
+                       os.path.join(target_folder, relative_path))
+        return stats
+    shutil.rmtree(old_folder, ignore_errors=True)
+    return stats
+
+
+def _find_cached_bytecode(folder) -> list:
+    """
+    Return the "/" separated paths of the files in the __pycache__ folders of folder.
+    """
+    cached_files = []
+    for root, dirnames, filenames in os.walk(folder):
+        if os.path.basename(root) == "__pycache__":
+            relative_root = os.path.relpath(root, folder).replace(os.sep, "/")
+            cached_files.extend(f"{relative_root}/{filename}" for filename in filenames)
+    return cached_files
+
+
+def _cached_source_of(cached_file) -> str:
+    """
+    Return the "/" separated path of the source file of a bytecode file, e.g.
+    "ui/__pycache__/panel.cpython-311.pyc" -> "ui/panel.py".
+    """
+    cache_folder, filename = cached_file.rsplit("/", 1)
+    source_folder = os.path.dirname(cache_folder).replace(os.sep, "/")
+    source_file = filename.split(".", 1)[0] + ".py"
+    return f"{source_folder}/{source_file}" if source_folder else source_file
+
+
+# imported modules of the staged py files, keyed by (relative path, md5)
+_staged_module_imports = {}
+
+
+def build_reload_manifest(staged_folder, addon_name, file_digests: dict) -> dict:
+    """
+    Describe a staged build for the start_up_command running in Blender: the md5 of every file and the modules of the
+    addon imported by each module, so that only changed modules and the modules importing them need to be reloaded.
+    """
+    global _staged_module_imports
+    module_names = {}
+    for relative_path in file_digests:
+        if relative_path.endswith(".py"):
+            parts = relative_path[:-3].split("/")
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            module_names[relative_path] = ".".join([addon_name] + parts)
+    all_modules = set(module_names.values())
+
+    module_imports = {}
+    staged_module_imports = {}
+    for relative_path, module_name in module_names.items():
+        key = (relative_path, file_digests[relative_path])
+        imported_modules = _staged_module_imports.get(key)
+        if imported_modules is None:
+            package = module_name if relative_path.endswith("__init__.py") else module_name.rpartition(".")[0]
+            imported_modules = parse_absolute_imports(read_utf8(os.path.join(staged_folder, relative_path)),
+                                                      relative_path, package)
+        staged_module_imports[key] = imported_modules
+        module_imports[module_name] = sorted(all_modules.intersection(imported_modules))
+    _staged_module_imports = staged_module_imports
+    return {"files": file_digests, "imports": module_imports}
+
+
+_STAGE_MANIFEST_VERSION = 1
+# digests of the staged files, reused by fingerprint_folder while the files are unchanged
+_staged_file_digests = {}
+
+
+def stage_addon_for_test(target_init_file, addon_name, release_dir=TEST_RELEASE_DIR, is_extension=IS_EXTENSION,
+                         changed_paths: set = None, module_index: ModuleIndex = None, import_graph_cache: dict = None,
+                         file_scanner: FileScanner = None):
+    """
+    Incrementally release an addon into release_dir/addon_name without zipping it.
+    A manifest of the last staged build is kept next to the staged folder, only files whose source content changed are
+    copied and rewritten again, files that dropped out of the dependency closure are removed. When the layout of the
+    release changes (files added or removed), all py files are rewritten since their imports might resolve differently,
+    a py file only counts as changed if its rewritten content differs from the staged one.
+    增量发布插件 只重新复制和处理内容发生变化的文件 并删除不再被依赖的文件
+
+    Args:
+        changed_paths: Absolute paths of the source files known to be changed (reported by the file watcher). When it
+                       is given, other files of the last staged build are trusted without checking them again.
+
+    Returns:
+        tuple: (staged folder, relative paths of changed files, relative paths of removed files)
+    """
+    check_release_target(release_dir, addon_name, is_extension)
+    release_folder = os.path.join(release_dir, addon_name)
+    release_files = collect_release_files(target_init_file, addon_name, module_index=module_index,
+                                          import_graph_cache=import_graph_cache, file_scanner=file_scanner,
+                                          include_tests=True)
+    layout = sorted(release_files.keys())
+
+    manifest = _load_stage_manifest(release_dir, addon_name)
+    previous_files = manifest.get("files", {})
+    if (manifest.get("version") != _STAGE_MANIFEST_VERSION or manifest.get("is_extension") != is_extension
+            or not os.path.isdir(release_folder)):
+        # nothing reusable, start from a clean folder
+        if os.path.exists(release_folder):
+            shutil.rmtree(release_folder)
+        previous_files = {}
+        manifest = {}
+    layout_changed = manifest.get("layout") != layout
+
+    staged_files = {}
+    changed_files = set()
+    for relative_path, source_file in release_files.items():
+        previous = previous_files.get(relative_path)
+        if (changed_paths is not None and not layout_changed and previous is not None
+                and previous["source"] == source_file and source_file not in changed_paths):
+            staged_files[relative_path] = previous
+            continue
+        source_stat = os.stat(source_file)
+        if (previous is not None and previous["source"] == source_file
+                and previous["size"] == source_stat.st_size and previous["mtime_ns"] == source_stat.st_mtime_ns):
+            content_hash = previous["hash"]
+        else:
+            content_hash = get_md5(source_file)
+        staged_files[relative_path] = {"source": source_file, "size": source_stat.st_size,
+                                       "mtime_ns": source_stat.st_mtime_ns, "hash": content_hash}
+        if (previous is None or previous["hash"] != content_hash
+                or not os.path.isfile(os.path.join(release_folder, relative_path))):
+            changed_files.add(relative_path)
+        elif "staged_hash" in previous:
+            staged_files[relative_path]["staged_hash"] = previous["staged_hash"]
+
+    removed_files = set(previous_files.keys()) - set(release_files.keys())
+    for relative_path in removed_files:
+        removed_file = os.path.join(release_folder, relative_path)
+        if os.path.isfile(removed_file):
+            os.remove(removed_file)
+    if len(removed_files) > 0:
+        while remove_empty_folders(release_folder) > 0:
+            pass
+
+    import_rewriter = ImportRewriter(layout, addon_name, is_extension)
+    for relative_path in changed_files:
+        content = stage_release_file(release_folder, relative_path, release_files[relative_path], import_rewriter)
+        if content is not None:
+            staged_files[relative_path]["staged_hash"] = hashlib.md5(content).hexdigest()
+    if layout_changed:
+        # imports might resolve differently, unchanged py files are rewritten again but are only written (and their
+        # bytecode in Blender invalidated) if the result differs from the staged file
+        # 布局改变时重新处理未修改的py文件 只有结果与已暂存的文件不同时才写入
+        for relative_path, staged in staged_files.items():
+            if not relative_path.endswith(".py") or relative_path in changed_files:
+                continue
+            content = build_release_file(relative_path, release_files[relative_path], import_rewriter)
+            staged_hash = hashlib.md5(content).hexdigest()
+            if staged.get("staged_hash") != staged_hash:
+                stage_release_file(release_folder, relative_path, release_files[relative_path], import_rewriter,
+                                   content)
+                staged["staged_hash"] = staged_hash
+                changed_files.add(relative_path)
+
+    # changes are accumulated until they are synced into Blender, see update_addon_for_test
+    # 累积尚未同步到Blender的变更
+    pending_sync = manifest.get("pending_sync", {})
+    changed_files = (set(pending_sync.get("changed", [])) - removed_files) | changed_files
+    removed_files = (set(pending_sync.get("removed", [])) - changed_files) | removed_files
+    manifest.update({"version": _STAGE_MANIFEST_VERSION, "is_extension": is_extension, "layout": layout,
+                     "files": staged_files,
+                     "pending_sync": {"changed": sorted(changed_files), "removed": sorted(removed_files)}})
+    _save_stage_manifest(release_dir, addon_name, manifest)
+    return release_folder, changed_files, removed_files
+
+
+def _stage_manifest_path(release_dir, addon_name):
+    # kept outside the staged folder so that it is never synced into Blender
+    return os.path.join(release_dir, f".{addon_name}.stage.json")
+
+
+def _load_stage_manifest(release_dir, addon_name) -> dict:
+    manifest_path = _stage_manifest_path(release_dir, addon_name)
+    if not os.path.isfile(manifest_path):
+        return {}
+    try:
+        return json.loads(read_utf8(manifest_path))
+    except ValueError:
+        return {}
+
+
+def _save_stage_manifest(release_dir, addon_name, manifest: dict):
+    write_utf8(_stage_manifest_path(release_dir, addon_name), json.dumps(manifest))
+
+
+# Build daemon 常驻后台的构建服务
+# Every run of release.py analyzes the workspace again: the project is walked, the module index is built and the import
+# graph cache is loaded and checked. The daemon keeps them in memory between requests, see daemon.py.
+# framework and config files, the daemon stops when one of them changes since it would serve stale code or settings
+_DAEMON_CONFIG_FILES = ("config.ini",)
+
+
+class BuildDaemon:
+    """
+    Local server keeping the analysis of the workspace warm, release.py, test.py --background and daemon.py send their
+    requests to it through a Unix socket instead of analyzing the workspace again. Tests run in the warm Blender
+    workers of worker_pool, warm_workers of them are started with the daemon.
+    The module index, the import graph cache and the walks of the folders are kept in memory. File system events
+    invalidate them as soon as files are added or removed, and since the events are delivered with a delay, the
+    modification times of the known folders are also checked before every request. Files changed in place are detected
+    by the import graph cache itself. Requests are served one at a time, their output is sent back to the client.
+    """
+
+    def __init__(self, socket_path=None, worker_pool: BlenderWorkerPool = None, warm_workers=0):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("The build daemon needs Unix sockets, which are not supported on this platform")
+        self.socket_path = socket_path or daemon_socket_path(PROJECT_ROOT)
+        self.module_index = ModuleIndex(PROJECT_ROOT)
+        self.import_graph_cache = load_import_graph_cache(PROJECT_ROOT, self.module_index)
+        self.file_scanner = FileScanner()
+        self.started = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._layout_changed = False
+        self._folder_stamps = self._read_folder_stamps()
+        # the daemon runs the code that was imported when it started
+        self._code_stamps = self._read_code_stamps()
+        self._server = None
+        # headless Blender processes running the tests, started by the first test request unless warm_workers is set
+        self.worker_pool = worker_pool or BlenderWorkerPool()
+        self.warm_workers = warm_workers
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_code_stamps(self) -> dict:
+        files = [os.path.abspath(module.__file__) for module in list(sys.modules.values())
+                 if getattr(module, "__file__", None) and is_subdirectory(module.__file__, PROJECT_ROOT)]
+        files += [os.path.join(PROJECT_ROOT, file) for file in _DAEMON_CONFIG_FILES]
+        return {file: self._stamp(file) for file in files}
+
+    def _read_folder_stamps(self) -> dict:
+        # a folder's modification time changes when a file is added to or removed from it
+        folders = {os.path.join(PROJECT_ROOT, *package.split("/")) for package in self.module_index.packages}
+        for folder in self.file_scanner.walked_folders():
+            for file in self.file_scanner.search_files(folder):
+                folders.add(os.path.dirname(file))
+        return {folder: self._stamp(folder) for folder in folders}
+
+    def on_file_event(self, event):
+        if event.event_type not in ("created", "deleted", "moved"):
+            # content changes are detected by the import graph cache
+            return
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if not path:
+                continue
+            parts = os.path.abspath(path).split(os.sep)
+            if "__pycache__" in parts or ".git" in parts or _CACHE_FOLDER in parts:
+                continue
+            with self._lock:
+                self._layout_changed = True
+                self.file_scanner.invalidate(os.path.dirname(os.path.abspath(path)))
+
+    def refresh(self):
+        # bring the analysis up to date before a request, changes whose events are not delivered yet are found by the
+        # modification times of the folders
+        with self._lock:
+            changed_folders = [folder for folder, stamp in self._folder_stamps.items() if self._stamp(folder) != stamp]
+            for folder in changed_folders:
+                self.file_scanner.invalidate(folder)
+            if self._layout_changed or changed_folders:
+                self.module_index = ModuleIndex(PROJECT_ROOT)
+                refresh_import_graph_cache_layout(self.import_graph_cache, self.module_index)
+                self._layout_changed = False
+
+    def handle_request(self, command: str, arguments: dict):
+        if command == "status":
+            return {"pid": os.getpid(), "project_root": PROJECT_ROOT, "requests": self.requests,
+                    "uptime": time.time() - self.started, "blender_workers": self.worker_pool.status()}
+        if command == "stop":
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return None
+        changed_code = [file for file, stamp in self._code_stamps.items() if self._stamp(file) != stamp]
+        if changed_code:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            raise DaemonUnavailable(f"The daemon stopped since {os.path.relpath(changed_code[0], PROJECT_ROOT)} "
+                                    f"changed, start it again to use the new code")
+        self.requests += 1
+        self.refresh()
+        try:
+            if command == "release":
+                return self.release(**arguments)
+            if command == "stage":
+                addon_name = arguments.get("addon") or ACTIVE_ADDON
+                return update_addon_for_test(get_init_file_path(addon_name), addon_name,
+                                             module_index=self.module_index,
+                                             import_graph_cache=self.import_graph_cache,
+                                             file_scanner=self.file_scanner)
+            if command == "test":
+                # the same as test.py --background
+                return run_background_tests(arguments.get("addon") or ACTIVE_ADDON, shards=arguments.get("shards"),
+                                            timeout=arguments.get("timeout"), verbose=arguments.get("verbose", False),
+                                            worker_pool=self.worker_pool, module_index=self.module_index,
+                                            import_graph_cache=self.import_graph_cache,
+                                            file_scanner=self.file_scanner)
+            raise ValueError(f"Unknown daemon command: {command}")
+        finally:
+            save_import_graph_cache(PROJECT_ROOT, self.import_graph_cache)
+            self.import_graph_cache["dirty"] = False
+            with self._lock:
+                self._folder_stamps = self._read_folder_stamps()
+
+    def release(self, addons=(), all_addons=False, need_zip=True, is_extension=None, with_timestamp=False,
+                with_version=False, scan_workers=None, workers=None):
+        # the same as release.py
+        addon_names = get_all_addon_names() if all_addons else list(addons) or [ACTIVE_ADDON]
+        release_options = {"need_zip": need_zip, "is_extension": IS_EXTENSION if is_extension is None else is_extension,
+                           "with_timestamp": with_timestamp, "with_version": with_version}
+        if len(addon_names) > 1:
+            return release_addons(addon_names, workers=workers, scan_workers=scan_workers,
+                                  module_index=self.module_index, import_graph_cache=self.import_graph_cache,
+                                  file_scanner=self.file_scanner, **release_options)
+        addon_name = addon_names[0]
+        init_file = get_init_file_path(addon_name)
+        release_files = collect_release_files(init_file, addon_name, scan_workers, module_index=self.module_index,
+                                              import_graph_cache=self.import_graph_cache,
+                                              file_scanner=self.file_scanner)
+        print("Dependency analysis: {hits} files from cache, {misses} files parsed".format(**dependency_cache_stats))
+        return {addon_name: release_addon(init_file, addon_name, release_files=release_files, **release_options)}
+
+    def serve_forever(self):
+        try:
+            # another daemon is already serving the workspace
+            request_daemon(PROJECT_ROOT, "status")
+            raise OSError(f"A daemon is already running for {PROJECT_ROOT}")
+        except DaemonUnavailable:
+            if os.path.exists(self.socket_path):
+                # left by a daemon that did not stop properly
+                os.remove(self.socket_path)
+
+        install_if_missing("watchdog")
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        daemon = self
+
+        class EventHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                daemon.on_file_event(event)
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline())
+                except ValueError:
+                    return
+                output = _DaemonOutput(self.wfile)
+                try:
+                    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                        result = daemon.handle_request(request.get("command"), request.get("arguments") or {})
+                    message = {"result": result}
+                except DaemonUnavailable as e:
+                    message = {"unavailable": str(e)}
+                except Exception as e:
+                    message = {"error": f"{type(e).__name__}: {e}"}
+                try:
+                    output.send(message)
+                except OSError:
+                    # the client is gone
+                    pass
+
+        observer = Observer()
+        observer.schedule(EventHandler(), PROJECT_ROOT, recursive=True)
+        observer.start()
+        self._server = socketserver.UnixStreamServer(self.socket_path, RequestHandler)
+        print(f"Build daemon serving {PROJECT_ROOT} on {self.socket_path}")
+        if self.warm_workers > 0:
+            threading.Thread(target=self._warm_up_workers, daemon=True).start()
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            observer.stop()
+            observer.join()
+            self.worker_pool.close()
+            print("Build daemon stopped")
+
+    def _warm_up_workers(self):
+        try:
+            self.worker_pool.warm_up(self.warm_workers)
+            print(f"{self.warm_workers} Blender workers started")
+        except BlenderWorkerError as e:
+            print("Could not start the Blender workers:", e)
+
+
+class _DaemonOutput:
+    # file like object sending what is printed while a request is handled to the client
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        if text:
+            try:
+                self.send({"output": text})
+            except OSError:
+                pass
+        return len(text)
+
+    def flush(self):
+        pass
 
-    # write an MD5 to the addon folder to inform the addon content has been changed
-    addon_md5 = get_md5_folder(executable_path)
-    write_utf8(os.path.join(test_addon_path, _addon_md5__signature), addon_md5)
+    def send(self, message: dict):
+        self._stream.write((json.dumps(message) + "\n").encode("utf-8"))
+        self._stream.flush()
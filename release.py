@@ -1,18 +1,54 @@
-from framework import get_init_file_path, release_addon
-from main import ACTIVE_ADDON, IS_EXTENSION
+import os
+import sys
+
+from common.io.daemon_client import request_daemon, DaemonUnavailable, DaemonError
 
 # 发布前请修改ACTIVE_ADDON参数
 
 # The name of the addon to be released, this name is defined in the config.py of the addon as __addon_name__
 # 插件的config.py文件中定义的插件名称 __addon_name__
 
+# When the build daemon of this workspace is running (see daemon.py), the release is done by the daemon, the framework
+# is only imported when releasing without it.
+# 构建守护进程运行时由其完成发布 否则在本进程中导入框架并发布
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def release_locally(args):
+    from framework import get_all_addon_names, get_init_file_path, release_addon, release_addons
+    from main import ACTIVE_ADDON, IS_EXTENSION
+
+    addons = get_all_addon_names() if args.all else args.addon or [ACTIVE_ADDON]
+    is_extension = args.is_extension or IS_EXTENSION
+    if len(addons) == 1:
+        release_addon(target_init_file=get_init_file_path(addons[0]),
+                      addon_name=addons[0],
+                      need_zip=not args.disable_zip,
+                      is_extension=is_extension,
+                      with_timestamp=args.with_timestamp,
+                      with_version=args.with_version,
+                      scan_workers=args.workers,
+                      )
+    else:
+        release_addons(addons,
+                       workers=args.jobs,
+                       scan_workers=args.workers,
+                       need_zip=not args.disable_zip,
+                       is_extension=is_extension,
+                       with_timestamp=args.with_timestamp,
+                       with_version=args.with_version,
+                       )
+
 
 if __name__ == '__main__':
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('addon', default=ACTIVE_ADDON, nargs='?', help='addon name')
-    parser.add_argument('--is_extension', default=IS_EXTENSION, action='store_true', help='If true, package the addon '
+    parser.add_argument('addon', default=[], nargs='*', help='addon name, several addons can be given to release '
+                                                             'them concurrently. Default is ACTIVE_ADDON')
+    parser.add_argument('--all', default=False, action='store_true', help='Release all addons under the addons '
+                                                                          'folder concurrently.')
+    parser.add_argument('--is_extension', default=False, action='store_true', help='If true, package the addon '
                                                                                           'as extension, framework '
                                                                                           'will convert absolute '
                                                                                           'import to relative import '
@@ -30,11 +66,24 @@ if __name__ == '__main__':
                                                                                    'released zip file name.')
     parser.add_argument('--with_timestamp', default=False, action='store_true', help='Append a timestamp to the zip '
                                                                                      'file name.')
+    parser.add_argument('--workers', default=None, type=int, help='Number of processes used to parse py files when '
+                                                                   'analyzing dependencies. Default is the number of '
+                                                                   'cpus, set to 1 to parse serially.')
+    parser.add_argument('--jobs', default=None, type=int, help='Number of addons packaged at the same time when '
+                                                               'releasing several addons. Default is the number of '
+                                                               'cpus.')
+    parser.add_argument('--no_daemon', default=False, action='store_true', help='Release in this process even if '
+                                                                                'the build daemon is running.')
     args = parser.parse_args()
-    release_addon(target_init_file=get_init_file_path(args.addon),
-                  addon_name=args.addon,
-                  need_zip=not args.disable_zip,
-                  is_extension=args.is_extension,
-                  with_timestamp=args.with_timestamp,
-                  with_version=args.with_version,
-                  )
+    if not args.no_daemon:
+        try:
+            request_daemon(PROJECT_ROOT, "release", addons=args.addon, all_addons=args.all,
+                           need_zip=not args.disable_zip, is_extension=True if args.is_extension else None,
+                           with_timestamp=args.with_timestamp, with_version=args.with_version,
+                           scan_workers=args.workers, workers=args.jobs)
+            sys.exit(0)
+        except DaemonUnavailable:
+            pass
+        except DaemonError as e:
+            sys.exit(str(e))
+    release_locally(args)
@@ -1,17 +1,69 @@
-from framework import test_addon
-from main import ACTIVE_ADDON
+import os
+import sys
+
+from common.io.daemon_client import request_daemon, DaemonUnavailable, DaemonError
 
 # 测试前请修改ACTIVE_ADDON参数
 
 # The name of the addon to be tested, this name is defined in the config.py of the addon as __addon_name__
 # 插件的config.py文件中定义的插件名称 __addon_name__
 
+# When the build daemon of this workspace is running (see daemon.py), test.py --background is run by the daemon, the
+# framework is only imported when testing without it.
+# 构建守护进程运行时由其运行 --background 测试 否则在本进程中导入框架
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_locally(args):
+    from framework import test_addon, run_background_tests, DEFAULT_WATCH_DEBOUNCE
+    from main import ACTIVE_ADDON
+
+    addon = args.addon or ACTIVE_ADDON
+    if args.background:
+        return run_background_tests(addon, shards=args.shards, timeout=args.timeout, verbose=args.verbose)
+    test_addon(addon, enable_watch=not args.disable_watch,
+               debounce=DEFAULT_WATCH_DEBOUNCE if args.debounce is None else args.debounce, profile=args.profile)
+    return True
+
+
 if __name__ == '__main__':
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('addon', default=ACTIVE_ADDON, nargs='?', help='addon name')
+    parser.add_argument('addon', default=None, nargs='?', help='addon name, default is ACTIVE_ADDON')
     parser.add_argument('--disable_watch', default=False, action='store_true', help='Do not reload addon when file '
                                                                                     'changed')
+    parser.add_argument('--debounce', default=None, type=float, help='Seconds without file changes to wait for before '
+                                                                     'reloading the addon, coalesces bursts of changes '
+                                                                     'into one reload. Default is '
+                                                                     'DEFAULT_WATCH_DEBOUNCE in framework.py.')
+    parser.add_argument('--profile', default=False, action='store_true', help='Measure the time spent in each step '
+                                                                             'when the addon is enabled and print '
+                                                                             'the report after Blender exits.')
+    parser.add_argument('--background', default=False, action='store_true', help='Run the test modules (test_*.py) '
+                                                                                'of the addon in headless Blender '
+                                                                                'processes and write JSON and JUnit '
+                                                                                'reports instead of opening Blender.')
+    parser.add_argument('--shards', default=None, type=int, help='Number of Blender processes running the tests at '
+                                                                 'once with --background, defaults to the number of '
+                                                                 'cpus.')
+    parser.add_argument('--timeout', default=None, type=float, help='Seconds after which a Blender process running '
+                                                                    'tests is stopped with --background.')
+    parser.add_argument('--verbose', default=False, action='store_true', help='Print the output of the Blender '
+                                                                             'processes with --background.')
+    parser.add_argument('--no_daemon', default=False, action='store_true', help='With --background, start new '
+                                                                                'Blender processes even if the build '
+                                                                                'daemon is running. By default the '
+                                                                                'tests run in its warm Blender '
+                                                                                'workers.')
     args = parser.parse_args()
-    test_addon(args.addon, enable_watch=not args.disable_watch)
+    if args.background and not args.no_daemon:
+        try:
+            passed = request_daemon(PROJECT_ROOT, "test", addon=args.addon, shards=args.shards, timeout=args.timeout,
+                                    verbose=args.verbose)
+            sys.exit(0 if passed else 1)
+        except DaemonUnavailable:
+            pass
+        except DaemonError as e:
+            sys.exit(str(e))
+    sys.exit(0 if test_locally(args) else 1)